@@ -1,5 +1,9 @@
 from django.contrib import admin
-from .models import Video, SavedWord
+from django.utils import timezone
+
+from .cache import definition_cache
+from .models import EnrichmentJob, Video, SavedWord, UndefinedWord
+from .subtitles import cue_index_for_video
 
 # This makes the "Video" table appear in the admin panel
 @admin.register(Video)
@@ -11,7 +15,43 @@ class VideoAdmin(admin.ModelAdmin):
         return (obj.description[:60] + '...') if obj.description and len(obj.description) > 60 else obj.description
     short_description.short_description = 'Description'
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Parse the subtitle file at upload time so the first viewer doesn't pay for it
+        cue_index_for_video(obj)
+
 # This makes the "SavedWord" table appear
 @admin.register(SavedWord)
 class SavedWordAdmin(admin.ModelAdmin):
-    list_display = ('word', 'meaning')
\ No newline at end of file
+    list_display = ('word', 'user', 'saved_at')
+    list_select_related = ('user',)
+    search_fields = ('word', 'user__username')
+
+# Negative cache: words no lookup tier could define
+@admin.register(UndefinedWord)
+class UndefinedWordAdmin(admin.ModelAdmin):
+    list_display = ('word', 'failures', 'retry_after', 'saved_lookups', 'updated_at')
+    search_fields = ('word',)
+    ordering = ('-saved_lookups',)
+    actions = ['retry_now']
+
+    @admin.action(description='Retry selected words on their next lookup')
+    def retry_now(self, request, queryset):
+        for word in queryset.values_list('word', flat=True):
+            definition_cache.delete(word)
+        updated = queryset.update(retry_after=timezone.now())
+        self.message_user(request, f"{updated} word(s) will be looked up again.")
+
+
+# Background Gemini lookups queued by hover cards (core/jobs.py)
+@admin.register(EnrichmentJob)
+class EnrichmentJobAdmin(admin.ModelAdmin):
+    list_display = ('word', 'status', 'attempts', 'run_after', 'last_error', 'updated_at')
+    list_filter = ('status',)
+    search_fields = ('word',)
+    actions = ['retry_now']
+
+    @admin.action(description='Run selected jobs again')
+    def retry_now(self, request, queryset):
+        updated = queryset.update(status='PENDING', attempts=0, run_after=timezone.now())
+        self.message_user(request, f"{updated} job(s) queued again.")
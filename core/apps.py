@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.conf import settings
+
+        from . import providers, signals  # noqa: F401
+        if settings.HOVERLEARN_PRELOAD:
+            providers.preload(settings.HOVERLEARN_PRELOAD)
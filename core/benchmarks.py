@@ -0,0 +1,280 @@
+"""
+Endpoint benchmark suite (`manage.py bench_endpoints`).
+
+EndpointBenchmark seeds a synthetic library: users, videos with large
+generated SRT files, notes and votes. It then drives the hot endpoints
+through the test client, one request at a time, and records for each one:
+    - p50/p95/max latency and sequential throughput (requests per second)
+    - SQL queries per request (deterministic, so any increase is a regression)
+Gemini is replaced by StubModel, which answers every word after a fixed
+latency, so runs are comparable between commits. compare() checks a run
+against the JSON of an earlier one.
+"""
+import json
+import os
+import random
+import re
+import statistics
+import time
+from contextlib import ExitStack, contextmanager
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_databases, teardown_databases
+
+from . import providers
+from .gemini import GeminiBatcher
+from .jobs import enrichment
+from .models import DictionaryEntry, SavedWord, Video, VideoNote, VideoVote
+from .progress import progress_buffer
+
+SYLLABLES = ('ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'te', 'vo', 'za', 'pi', 'do', 'fe', 'gu', 'ha', 'ji', 'bo')
+# Seconds between the starts of two generated cues
+CUE_SPACING = 3.0
+# Slowdowns smaller than this are timer noise on the fastest endpoints, whatever the tolerance
+MIN_REGRESSION_MS = 1.0
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+class StubModel:
+    """Stands in for genai.GenerativeModel: defines every word in the prompt after `latency` seconds."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def generate_content(self, prompt):
+        time.sleep(self.latency)
+        words = re.findall(r"'([^']+)'", prompt.split('. Also')[0])
+        payload = {w: {'definition': f"meaning of {w}", 'hindi': '', 'synonyms': []} for w in words}
+
+        class Response:
+            text = json.dumps(payload)
+        return Response()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * pct), len(ordered) - 1)]
+
+
+def pseudo_words(rng, count):
+    """`count` distinct made-up words, so nothing is found in the real dictionaries by accident."""
+    words = set()
+    while len(words) < count:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def srt_timestamp(seconds):
+    millis = round(seconds * 1000)
+    return f"{millis // 3600000:02d}:{millis // 60000 % 60:02d}:{millis // 1000 % 60:02d},{millis % 1000:03d}"
+
+
+def generate_srt(rng, vocabulary, cues):
+    blocks = []
+    for i in range(cues):
+        start = i * CUE_SPACING
+        text = ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(5, 12)))
+        blocks.append(f"{i + 1}\n{srt_timestamp(start)} --> {srt_timestamp(start + CUE_SPACING - 0.5)}\n{text}\n")
+    return '\n'.join(blocks)
+
+
+class EndpointBenchmark:
+    """
+    Seeds the current database and times the endpoints. Meant for a throwaway
+    database: bench_endpoints runs it inside a freshly created test database.
+    """
+
+    def __init__(self, users=20, videos=10, cues=2000, notes=1000, saved=200, requests=50, model_latency=0.05, seed=0):
+        self.config = {
+            'users': users, 'videos': videos, 'cues': cues, 'notes': notes, 'saved': saved,
+            'requests': requests, 'model_latency': model_latency, 'seed': seed,
+        }
+        self.rng = random.Random(seed)
+        self.vocabulary = pseudo_words(self.rng, 500)
+        # Words never used in a subtitle, for cold hovers
+        self.unseen = iter(f"{w}x" for w in pseudo_words(self.rng, 10 * requests + 100))
+
+    def seed(self):
+        c = self.config
+        rng = self.rng
+        users = User.objects.bulk_create([User(username=f"bench{i}") for i in range(c['users'])])
+        self.users = list(User.objects.filter(username__in=[u.username for u in users]).order_by('id'))
+
+        self.videos = []
+        for i in range(c['videos']):
+            name = default_storage.save(f"subs/bench-{i}.srt", ContentFile(generate_srt(rng, self.vocabulary, c['cues']).encode()))
+            # One at a time so the post_save signal indexes each video's cues for search
+            self.videos.append(Video.objects.create(
+                title=f"Bench {i} {rng.choice(self.vocabulary)}",
+                description=' '.join(rng.sample(self.vocabulary, 8)),
+                video_file='videos/bench.mp4', subtitle_file=name,
+            ))
+
+        VideoNote.objects.bulk_create([
+            VideoNote(user=rng.choice(self.users), video=rng.choice(self.videos),
+                      content=' '.join(rng.sample(self.vocabulary, 6)), timestamp=rng.uniform(0, c['cues'] * CUE_SPACING))
+            for _ in range(c['notes'])
+        ])
+        votes = [
+            VideoVote(user=user, video=video, vote=rng.choice(('LIKE', 'DISLIKE')))
+            for user in self.users for video in self.videos if rng.random() < 0.5
+        ]
+        VideoVote.objects.bulk_create(votes)
+        # Every vocabulary word is defined, and each user has saved `saved` of them
+        DictionaryEntry.objects.bulk_create([
+            DictionaryEntry(word=word.upper(), definition=f"meaning of {word}", source='wordnet') for word in self.vocabulary
+        ])
+        SavedWord.objects.bulk_create([
+            SavedWord(user=user, word=word.upper())
+            for user in self.users for word in rng.sample(self.vocabulary, min(c['saved'], len(self.vocabulary)))
+        ])
+        for video in self.videos:
+            video.like_count = sum(v.video_id == video.id and v.vote == 'LIKE' for v in votes)
+            video.dislike_count = sum(v.video_id == video.id and v.vote == 'DISLIKE' for v in votes)
+        Video.objects.bulk_update(self.videos, ['like_count', 'dislike_count'])
+
+        self.clients = []
+        for user in self.users[:10]:
+            client = Client()
+            client.force_login(user)
+            self.clients.append(client)
+
+    def scenarios(self):
+        """(name, settings overrides, request factory) in the order they run; each factory returns (method, path, data)."""
+        rng = self.rng
+        videos = self.videos
+        duration = self.config['cues'] * CUE_SPACING
+        # Hovered cold (and so stored) by the model scenario, then hovered again warm
+        stored = []
+
+        def cold_word():
+            word = next(self.unseen)
+            return 'get', f"/get-def/{word}/", None
+
+        def model_word():
+            word = next(self.unseen)
+            stored.append(word)
+            return 'get', f"/get-def/{word}/", None
+
+        return [
+            ('home', {}, lambda: ('get', '/', None)),
+            ('home_search', {}, lambda: ('get', '/', {'q': rng.choice(self.vocabulary)})),
+            ('watch_video', {}, lambda: ('get', f"/watch/{rng.choice(videos).id}/", None)),
+            # A miss answered locally while the word is queued for enrichment (the default)
+            ('get_definition_cold', {'DEFINITION_ENRICH_IN_BACKGROUND': True}, cold_word),
+            # A miss that waits for the (stubbed) model
+            ('get_definition_cold_model', {'DEFINITION_ENRICH_IN_BACKGROUND': False}, model_word),
+            ('get_definition_warm', {}, lambda: ('get', f"/get-def/{rng.choice(stored)}/", None)),
+            ('update_history', {}, lambda: ('post', '/update-history/', {
+                'video_id': rng.choice(videos).id, 'current_time': f"{rng.uniform(0, duration):.2f}",
+            })),
+            ('handle_vote', {}, lambda: ('post', f"/vote/{rng.choice(videos).id}/{rng.choice(('LIKE', 'DISLIKE'))}/", None)),
+            ('save_note', {}, lambda: ('post', f"/video/{rng.choice(videos).id}/save-note/", {
+                'content': ' '.join(rng.sample(self.vocabulary, 6)), 'timestamp': f"{rng.uniform(0, duration):.2f}",
+            })),
+            ('save_word', {}, lambda: ('post', f"/save-word/{rng.choice(self.vocabulary)}/", None)),
+            ('saved_list', {}, lambda: ('get', '/my-list/', None)),
+        ]
+
+    def measure(self, make_request, warmup=3):
+        samples, queries = [], []
+        for i in range(warmup + self.config['requests']):
+            client = self.clients[i % len(self.clients)]
+            method, path, data = make_request()
+            with ExitStack() as stack:
+                # Every alias: dictionary lookups run on their own database (core/routers.py)
+                captured = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+                started = time.perf_counter()
+                response = getattr(client, method)(path, data)
+                elapsed = time.perf_counter() - started
+            if response.status_code >= 400:
+                raise BenchmarkError(f"{method.upper()} {path} answered {response.status_code}")
+            if i >= warmup:
+                samples.append(elapsed)
+                queries.append(sum(len(c) for c in captured))
+        return {
+            'requests': len(samples),
+            'p50_ms': statistics.median(samples) * 1000,
+            'p95_ms': percentile(samples, 0.95) * 1000,
+            'max_ms': max(samples) * 1000,
+            'rps': len(samples) / sum(samples),
+            'queries_per_request': statistics.mean(queries),
+        }
+
+    def run(self, progress=None):
+        """Seed, then measure every scenario; returns {'config': ..., 'endpoints': {name: result}}."""
+        results = {}
+        with ExitStack() as stack:
+            stack.enter_context(mock.patch.dict(providers._instances, {
+                'gemini': GeminiBatcher(StubModel(self.config['model_latency']), max_wait=0.01),
+            }))
+            # No background threads: enrichment jobs stay queued and progress stays buffered
+            stack.enter_context(mock.patch.object(enrichment, 'in_process', False))
+            stack.enter_context(mock.patch.object(progress_buffer, 'interval', 0))
+            self.seed()
+            for name, overrides, make_request in self.scenarios():
+                with override_settings(**overrides):
+                    results[name] = self.measure(make_request)
+                if progress:
+                    progress(name, results[name])
+        return {'config': self.config, 'endpoints': results}
+
+
+@contextmanager
+def throwaway_databases(root):
+    """
+    Every configured database created afresh (migrated, empty) for the block.
+    SQLite ones are files under `root`, like the real ones, rather than in memory.
+    """
+    names = {alias: (connections.settings[alias]['NAME'], connections.settings[alias]['TEST'].get('NAME'))
+             for alias in connections}
+    for alias in connections:
+        settings_dict = connections.settings[alias]
+        if settings_dict['ENGINE'].endswith('sqlite3') and not settings_dict['TEST'].get('MIRROR'):
+            settings_dict['TEST']['NAME'] = os.path.join(root, f"{alias}.sqlite3")
+    old_config = setup_databases(verbosity=0, interactive=False, serialized_aliases=set())
+    # A mirror is handed its primary's settings. Point its own at the test database
+    # instead: it keeps its OPTIONS (query_only), and threads started later see it too.
+    for alias in connections:
+        settings_dict = connections.settings[alias]
+        mirror = settings_dict['TEST'].get('MIRROR')
+        if mirror:
+            connections[alias].close()
+            settings_dict['NAME'] = connections[mirror].settings_dict['NAME']
+            connections[alias].settings_dict = settings_dict
+    try:
+        yield
+    finally:
+        for alias in connections:
+            connections[alias].close()
+        teardown_databases(old_config, verbosity=0)
+        for alias, (name, test_name) in names.items():
+            settings_dict = connections.settings[alias]
+            settings_dict['NAME'], settings_dict['TEST']['NAME'] = name, test_name
+            connections[alias].settings_dict = settings_dict
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of `results` against `baseline`: p50 slower beyond `tolerance` (and MIN_REGRESSION_MS), or more queries per request."""
+    regressions = []
+    for name, current in results['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if before is None:
+            continue
+        # The median, not p95: a few slow outliers on a busy machine are not a regression
+        limit = max(before['p50_ms'] * (1 + tolerance), before['p50_ms'] + MIN_REGRESSION_MS)
+        if current['p50_ms'] > limit:
+            regressions.append(f"{name}: p50 {current['p50_ms']:.1f}ms vs baseline {before['p50_ms']:.1f}ms")
+        if current['queries_per_request'] > before['queries_per_request']:
+            regressions.append(
+                f"{name}: {current['queries_per_request']:.1f} queries/request vs baseline {before['queries_per_request']:.1f}"
+            )
+    return regressions
@@ -0,0 +1,155 @@
+"""
+Two-level cache for word definitions.
+
+    1. LocalCache: a small LRU with a TTL inside each worker process
+    2. the shared Django cache (settings.DEFINITION_CACHE_ALIAS), seen by every worker
+
+Keys are the DictionaryEntry key (the cleaned, upper-cased word) and are
+versioned with settings.DEFINITION_CACHE_VERSION, so changing the cached
+format only needs a version bump. Saving or deleting a DictionaryEntry
+updates the shared level and this process's local level (see
+core/signals.py); other processes pick the change up once their local copy
+expires, which is why the local TTL is kept short.
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+_MISSING = object()
+
+
+class LocalCache:
+    """Thread-safe bounded LRU whose entries expire after `ttl` seconds."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self._stats['misses'] += 1
+                return default
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return default
+            self._data.move_to_end(key)
+            self._stats['hits'] += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self._stats['hits'],
+                'misses': self._stats['misses'],
+                'evictions': self._stats['evictions'],
+                'expirations': self._stats['expirations'],
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+            }
+
+
+class DefinitionCache:
+    key_prefix = 'definition'
+
+    def __init__(self, alias, version, timeout, local_maxsize, local_ttl):
+        self.alias = alias
+        self.version = version
+        self.timeout = timeout
+        self.local = LocalCache(local_maxsize, local_ttl)
+        self._lock = threading.Lock()
+        self._shared_stats = Counter()
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def _key(self, word):
+        return f"{self.key_prefix}:{word}"
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._shared_stats[name] += n
+
+    def get(self, word):
+        value = self.local.get(word)
+        if value is not None:
+            return value
+        value = self.shared.get(self._key(word), version=self.version)
+        if value is None:
+            self._count('misses')
+            return None
+        self._count('hits')
+        self.local.set(word, value)
+        return value
+
+    async def aget(self, word):
+        """get() for async views; only the shared level does I/O."""
+        value = self.local.get(word)
+        if value is not None:
+            return value
+        value = await self.shared.aget(self._key(word), version=self.version)
+        if value is None:
+            self._count('misses')
+            return None
+        self._count('hits')
+        self.local.set(word, value)
+        return value
+
+    def set(self, word, value, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        self.local.set(word, value, ttl=timeout)
+        self.shared.set(self._key(word), value, timeout=timeout, version=self.version)
+        self._count('sets')
+
+    async def aset(self, word, value, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        self.local.set(word, value, ttl=timeout)
+        await self.shared.aset(self._key(word), value, timeout=timeout, version=self.version)
+        self._count('sets')
+
+    def delete(self, word):
+        self.local.delete(word)
+        self.shared.delete(self._key(word), version=self.version)
+        self._count('deletes')
+
+    def stats(self):
+        with self._lock:
+            shared = {name: self._shared_stats[name] for name in ('hits', 'misses', 'sets', 'deletes')}
+        return {'local': self.local.stats(), 'shared': shared}
+
+
+definition_cache = DefinitionCache(
+    alias=settings.DEFINITION_CACHE_ALIAS,
+    version=settings.DEFINITION_CACHE_VERSION,
+    timeout=settings.DEFINITION_CACHE_TIMEOUT,
+    local_maxsize=settings.DEFINITION_LOCAL_CACHE_SIZE,
+    local_ttl=settings.DEFINITION_LOCAL_CACHE_TTL,
+)
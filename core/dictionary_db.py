@@ -0,0 +1,109 @@
+"""
+Shipping the dictionary database (core/routers.py) as a prebuilt file
+(`manage.py dictionary_db`), so a new node starts with every word already
+defined instead of filling it one Gemini call at a time:
+    - export_dictionary() writes a consistent, compacted copy with VACUUM INTO,
+      safe while the app is running
+    - import_dictionary() checks a file and swaps it in atomically; run it with
+      the app stopped, then migrate the 'dictionary' database
+    - copy_from_default() copies the rows of an install from before the split
+      out of the old tables in db.sqlite3
+"""
+import os
+import shutil
+import sqlite3
+from itertools import islice
+
+from django.apps import apps
+from django.db import connections
+
+from .routers import DICTIONARY_MODELS, WRITE_ALIAS
+
+COPY_BATCH_SIZE = 1000
+
+
+class DictionaryFileError(Exception):
+    pass
+
+
+def dictionary_models():
+    return [model for model in apps.get_app_config('core').get_models() if model._meta.model_name in DICTIONARY_MODELS]
+
+
+def inspect_file(path):
+    """{table: rows} of the dictionary tables in the SQLite file at `path`; DictionaryFileError if it isn't one."""
+    if not os.path.isfile(path):
+        raise DictionaryFileError(f"{path} does not exist.")
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            if conn.execute("PRAGMA quick_check").fetchone()[0] != 'ok':
+                raise DictionaryFileError(f"{path} is corrupt.")
+            tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            missing = {'django_migrations', *(model._meta.db_table for model in dictionary_models())} - tables
+            if missing:
+                raise DictionaryFileError(f"{path} is not a dictionary database (no {', '.join(sorted(missing))}).")
+            return {
+                model._meta.db_table: conn.execute(f'SELECT COUNT(*) FROM "{model._meta.db_table}"').fetchone()[0]
+                for model in dictionary_models()
+            }
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError as e:
+        raise DictionaryFileError(f"{path} is not a SQLite database: {e}")
+
+
+def export_dictionary(path, using=WRITE_ALIAS):
+    """Write a snapshot of the dictionary database to `path`; returns inspect_file() of it."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        raise DictionaryFileError("Only a SQLite dictionary database can be exported to a file.")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    with connection.cursor() as cursor:
+        cursor.execute("VACUUM INTO %s", [tmp_path])
+    counts = inspect_file(tmp_path)
+    os.replace(tmp_path, path)
+    return counts
+
+
+def import_dictionary(path, target):
+    """Replace the SQLite file `target` with a checked copy of `path`; returns inspect_file() of it."""
+    counts = inspect_file(path)
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    shutil.copyfile(path, tmp_path)
+    # The old file's log would otherwise be replayed onto the new one
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(f"{target}{suffix}"):
+            os.remove(f"{target}{suffix}")
+    os.replace(tmp_path, target)
+    return counts
+
+
+def copy_from_default(batch_size=COPY_BATCH_SIZE):
+    """
+    Copy the dictionary rows left in the 'default' database. Rows are matched on
+    their word (unique in every dictionary table) and ones already there are kept.
+    Only the columns the old tables have are read: fields added since the split
+    (migrated on 'dictionary' alone) take their defaults.
+    Returns {table: rows read}, None for a table 'default' doesn't have.
+    """
+    connection = connections['default']
+    tables = set(connection.introspection.table_names())
+    copied = {}
+    for model in dictionary_models():
+        table = model._meta.db_table
+        if table not in tables:
+            copied[table] = None
+            continue
+        with connection.cursor() as cursor:
+            columns = {c.name for c in connection.introspection.get_table_description(cursor, table)}
+        # The ids of the two databases overlap; a fresh one each
+        fields = [f.attname for f in model._meta.concrete_fields if f.column in columns and not f.primary_key]
+        copied[table] = 0
+        rows = model.objects.using('default').order_by('pk').values(*fields).iterator(chunk_size=batch_size)
+        while batch := list(islice(rows, batch_size)):
+            model.objects.using(WRITE_ALIAS).bulk_create([model(**row) for row in batch], ignore_conflicts=True)
+            copied[table] += len(batch)
+    return copied
@@ -0,0 +1,153 @@
+"""
+Streaming exports of "My List" (views.export_list): saved words and video
+notes as CSV, Anki-style TSV or JSON Lines.
+
+A heavy user's list runs to tens of thousands of rows, and rendering it
+through saved_list would hold every row, and the whole file, in memory.
+Here nothing is built up front:
+    - rows come from QuerySet.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    - saved words get their definitions with one in_bulk() per chunk (the
+      dictionary has its own database, core/routers.py, so it can't be a JOIN)
+    - rows are written one at a time to a buffer that is handed to the
+      server every EXPORT_FLUSH_BYTES
+    - when the client accepts gzip the stream is compressed as it goes
+So memory stays flat whatever the row count (`manage.py bench_exports`).
+"""
+import csv
+import io
+import json
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.text import compress_sequence
+
+from .models import DictionaryEntry, SavedWord, VideoNote
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FLUSH_BYTES = 64 * 1024
+
+# format -> (content type, file extension)
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    # Anki's "Import File" reads the #-headers: tab-separated, plain text, named columns
+    'tsv': ('text/tab-separated-values; charset=utf-8', 'txt'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+}
+WORD_FIELDS = ['word', 'definition', 'hindi', 'synonyms', 'saved_at']
+NOTE_FIELDS = ['video', 'timestamp', 'seconds', 'content', 'created_at']
+
+
+
+class UnknownExport(Exception):
+    pass
+
+
+def accepts_gzip(accept_encoding):
+    """
+    Whether an Accept-Encoding header allows gzip: listed (or covered by "*")
+    with a q-value above zero. "gzip;q=0" refuses it, which a plain search for
+    "gzip" (as GZipMiddleware does) would miss.
+    """
+    qualities = {}
+    for item in accept_encoding.split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            qualities[coding.lower()] = q
+    q = qualities.get('gzip', qualities.get('x-gzip', qualities.get('*', 0.0)))
+    return q > 0
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def word_rows(user):
+    saved = (
+        SavedWord.objects.filter(user=user).order_by('id')
+        .values_list('word', 'saved_at').iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for chunk in chunked(saved, EXPORT_CHUNK_SIZE):
+        entries = DictionaryEntry.objects.in_bulk([word for word, _ in chunk], field_name='word')
+        for word, saved_at in chunk:
+            entry = entries.get(word)
+            yield {
+                'word': word.lower(),
+                'definition': entry.definition if entry else '',
+                'hindi': (entry.hindi or '') if entry else '',
+                'synonyms': (entry.synonyms or '') if entry else '',
+                'saved_at': saved_at.isoformat(),
+            }
+
+
+def note_rows(user):
+    notes = (
+        VideoNote.objects.filter(user=user).select_related('video').order_by('created_at', 'id')
+        .only('content', 'timestamp', 'created_at', 'video__title').iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for note in notes:
+        yield {
+            'video': note.video.title,
+            'timestamp': note.formatted_timestamp() or '',
+            'seconds': note.timestamp,
+            'content': note.content,
+            'created_at': note.created_at.isoformat(),
+        }
+
+
+EXPORTS = {
+    'words': (word_rows, WORD_FIELDS),
+    'notes': (note_rows, NOTE_FIELDS),
+}
+
+
+def encode(rows, fields, fmt):
+    """`rows` (dicts) in `fmt`, as UTF-8 chunks of about EXPORT_FLUSH_BYTES."""
+    buffer = io.StringIO()
+    if fmt == 'jsonl':
+        def write(row):
+            buffer.write(json.dumps(row, ensure_ascii=False))
+            buffer.write('\n')
+    else:
+        writer = csv.DictWriter(buffer, fields, delimiter='\t' if fmt == 'tsv' else ',', lineterminator='\n')
+        write = writer.writerow
+        if fmt == 'tsv':
+            buffer.write('#separator:tab\n#html:false\n#columns:' + '\t'.join(fields) + '\n')
+        else:
+            # The byte order mark makes Excel read the Hindi as UTF-8
+            buffer.write('\ufeff')
+            writer.writeheader()
+    for row in rows:
+        write(row)
+        if buffer.tell() >= EXPORT_FLUSH_BYTES:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def export_response(request, kind, fmt):
+    """A StreamingHttpResponse of the user's `kind` ('words' or 'notes') in `fmt`; UnknownExport otherwise."""
+    if kind not in EXPORTS or fmt not in FORMATS:
+        raise UnknownExport(f"{kind}.{fmt}")
+    make_rows, fields = EXPORTS[kind]
+    content_type, extension = FORMATS[fmt]
+    chunks = encode(make_rows(request.user), fields, fmt)
+    gzip = accepts_gzip(request.headers.get('Accept-Encoding', ''))
+    response = StreamingHttpResponse(compress_sequence(chunks) if gzip else chunks, content_type=content_type)
+    if gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Content-Disposition'] = f'attachment; filename="hoverlearn-{kind}.{extension}"'
+    patch_vary_headers(response, ['Accept-Encoding'])
+    patch_cache_control(response, private=True, no_store=True)
+    return response
@@ -0,0 +1,253 @@
+"""
+Batched, de-duplicated Gemini lookups.
+
+Every unknown word used to cost one generate_content() round-trip, and
+viewers hovering the same new word at the same time each paid for it.
+GeminiBatcher sits in front of the model:
+    - words requested while a call for them is already queued or running
+      wait on that call instead of issuing another one (single-flight)
+    - pending words are grouped into one multi-word JSON prompt, sent once
+      `batch_size` words are waiting or the oldest has waited `max_wait` seconds
+    - alookup() awaits the same futures from async views, so waiting on a
+      slow model holds no thread
+WaitSlots caps how many async lookups of one process wait on it at once.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+
+class GeminiLookupError(Exception):
+    pass
+
+
+class GeminiTimeoutError(GeminiLookupError):
+    """The caller stopped waiting; the request itself may still complete."""
+
+
+def build_prompt(words):
+    quoted = ", ".join(f"'{w}'" for w in words)
+    return (
+        f"Define each of these words in simple English: {quoted}. "
+        f"Also provide the Hindi translation and 3 synonyms for each word. "
+        f"Return ONLY a JSON object mapping each word exactly as given to an object "
+        f"with keys: 'definition', 'hindi', 'synonyms' (list)."
+    )
+
+
+def parse_response(text, words):
+    """Map each requested word to its entry in the model's JSON reply."""
+    text = text.replace('```json', '').replace('```', '').strip()
+    data = json.loads(text)
+    if not isinstance(data, dict):
+        raise GeminiLookupError("Expected a JSON object")
+    by_lower = {str(k).strip().lower(): v for k, v in data.items()}
+    results = {}
+    for word in words:
+        entry = by_lower.get(word.lower())
+        if isinstance(entry, dict):
+            results[word] = entry
+    return results
+
+
+class WaitSlots:
+    """
+    A semaphore for coroutines of every event loop in the process. Under WSGI,
+    async_to_sync runs each request in a loop of its own, so an asyncio.Semaphore
+    (bound to one loop) would limit nothing. A waiter parks on a future of its
+    own loop, which release() resolves from whichever thread frees the slot.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._waiters = deque()     # (loop, future), longest waiting first
+
+    async def acquire(self, timeout=None):
+        """True once a slot is held; False if none came free within `timeout` seconds."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._in_use < self.limit and not self._waiters:
+                self._in_use += 1
+                return True
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], timeout)
+            return True
+        except BaseException as e:
+            with self._lock:
+                handed_over = waiter not in self._waiters
+                if not handed_over:
+                    self._waiters.remove(waiter)
+            if handed_over:
+                # release() passed us the slot just as we gave up: pass it on
+                self.release()
+            if isinstance(e, asyncio.TimeoutError):
+                return False
+            raise
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                self._in_use -= 1
+                return
+            # The slot goes straight to the longest waiter, so _in_use stays the same
+            loop, future = self._waiters.popleft()
+        try:
+            loop.call_soon_threadsafe(_resolve, future)
+        except RuntimeError:
+            # Its loop is closed, so nobody is waiting there any more
+            self.release()
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class GeminiBatcher:
+    def __init__(self, model, batch_size=20, max_wait=0.05, timeout=30.0, max_concurrent_batches=4):
+        self.model = model
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._has_pending = threading.Condition(self._lock)
+        self._inflight = {}      # word -> Future shared by every caller asking for it
+        self._pending = []       # words waiting for the next batch
+        self._first_pending_at = None
+        self._collector = None
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_batches, thread_name_prefix='gemini-batch')
+
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._counters = Counter()
+
+    # --- public API ---
+
+    def lookup(self, word, timeout=None):
+        """Definition dict for one word; raises GeminiLookupError if Gemini has no answer."""
+        future = self._submit([word])[word]
+        try:
+            return future.result(timeout=self.timeout if timeout is None else timeout)
+        except FutureTimeoutError:
+            self._count('timeouts')
+            raise GeminiTimeoutError(f"Timed out waiting for '{word}'")
+
+    async def alookup(self, word, timeout=None):
+        """lookup() for async callers: awaits the shared future instead of blocking a thread."""
+        future = self._submit([word])[word]
+        try:
+            # shield(): giving up must not cancel the future other callers share
+            return await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(future)),
+                self.timeout if timeout is None else timeout,
+            )
+        except asyncio.TimeoutError:
+            self._count('timeouts')
+            raise GeminiTimeoutError(f"Timed out waiting for '{word}'")
+
+    def lookup_many(self, words, timeout=None):
+        """{word: definition dict} for every word Gemini answered; failures are left out."""
+        futures = self._submit(words)
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        results = {}
+        for word, future in futures.items():
+            try:
+                results[word] = future.result(timeout=max(deadline - time.monotonic(), 0))
+            except FutureTimeoutError:
+                self._count('timeouts')
+            except GeminiLookupError:
+                pass
+        return results
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'batches': self._counters['batches'],
+                'words_sent': self._counters['words_sent'],
+                'coalesced_waits': self._counters['coalesced_waits'],
+                'errors': self._counters['errors'],
+                'timeouts': self._counters['timeouts'],
+                'batch_sizes': dict(self._batch_sizes),
+            }
+
+    # --- internals ---
+
+    def _count(self, name, n=1):
+        with self._stats_lock:
+            self._counters[name] += n
+
+    def _submit(self, words):
+        futures = {}
+        coalesced = 0
+        with self._lock:
+            for word in dict.fromkeys(words):
+                future = self._inflight.get(word)
+                if future is not None:
+                    coalesced += 1
+                else:
+                    future = Future()
+                    self._inflight[word] = future
+                    if not self._pending:
+                        self._first_pending_at = time.monotonic()
+                    self._pending.append(word)
+                futures[word] = future
+            if self._pending:
+                self._ensure_collector()
+                self._has_pending.notify()
+        if coalesced:
+            self._count('coalesced_waits', coalesced)
+        return futures
+
+    def _ensure_collector(self):
+        # Called with self._lock held; the thread is started lazily so forked workers get their own
+        if self._collector is None or not self._collector.is_alive():
+            self._collector = threading.Thread(target=self._collect, name='gemini-collector', daemon=True)
+            self._collector.start()
+
+    def _collect(self):
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._has_pending.wait()
+                while len(self._pending) < self.batch_size:
+                    remaining = self._first_pending_at + self.max_wait - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._has_pending.wait(remaining)
+                batch = self._pending[:self.batch_size]
+                del self._pending[:self.batch_size]
+                self._first_pending_at = time.monotonic() if self._pending else None
+            self._executor.submit(self._send, batch)
+
+    def _send(self, words):
+        with self._stats_lock:
+            self._counters['batches'] += 1
+            self._counters['words_sent'] += len(words)
+            self._batch_sizes[len(words)] += 1
+        try:
+            response = self.model.generate_content(build_prompt(words))
+            results = parse_response(response.text, words)
+            error = None
+        except Exception as e:
+            self._count('errors')
+            results = {}
+            error = e
+
+        with self._lock:
+            futures = {word: self._inflight.pop(word) for word in words}
+        for word, future in futures.items():
+            if word in results:
+                future.set_result(results[word])
+            elif error is not None:
+                future.set_exception(GeminiLookupError(str(error)))
+            else:
+                future.set_exception(GeminiLookupError(f"No definition returned for '{word}'"))
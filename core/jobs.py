@@ -0,0 +1,146 @@
+"""
+Background Gemini enrichment for hover cards.
+
+With settings.DEFINITION_ENRICH_IN_BACKGROUND, get_definition no longer waits
+for Gemini on a miss: the card is answered from WordNet at once (or says the
+word is being looked up) and the word is queued as an EnrichmentJob row.
+EnrichmentRunner works through the queue:
+    - claim() takes up to ENRICHMENT_BATCH_SIZE due jobs with a conditional
+      UPDATE per row, so several processes can share the queue; a job left
+      RUNNING for LEASE_SECONDS (its worker died) is claimed again
+    - the words go to Gemini as one lookup_many() batch; answers replace the
+      DictionaryEntry (and so the cached definition, core/signals.py)
+    - unanswered words are retried with doubling delays, and after
+      ENRICHMENT_MAX_ATTEMPTS the job is FAILED and, if nothing local defines
+      the word either, it goes to the negative cache; a hover after that
+      expires reopens the job
+The card polls get_definition while its job is open and swaps in the result.
+Jobs run in a daemon thread of the web process (ENRICHMENT_IN_PROCESS) or in
+`manage.py run_enrichment_jobs`.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import providers
+from .metrics import count_lookup, time_tier
+from .models import DictionaryEntry, EnrichmentJob
+
+logger = logging.getLogger(__name__)
+
+# A RUNNING job not finished after this many seconds is claimed again
+LEASE_SECONDS = 120
+# How often an idle runner looks for due jobs (enqueue() wakes it up at once)
+IDLE_POLL_SECONDS = 5.0
+
+OPEN_STATUSES = ('PENDING', 'RUNNING')
+
+
+class EnrichmentRunner:
+    def __init__(self, batch_size, max_attempts, retry_delay, in_process):
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.in_process = in_process
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def enqueue(self, *words):
+        """Queue `words` (DictionaryEntry keys), except those that already have an open job."""
+        EnrichmentJob.objects.bulk_create([EnrichmentJob(word=word) for word in words], ignore_conflicts=True)
+        # A finished job means the word was given up on and its negative cache entry has since
+        # expired (or its definition was deleted): start it over, with its attempts back to zero
+        now = timezone.now()
+        EnrichmentJob.objects.filter(word__in=words).exclude(status__in=OPEN_STATUSES).update(
+            status='PENDING', attempts=0, run_after=now, last_error='', updated_at=now,
+        )
+        if self.in_process:
+            self._ensure_thread()
+            self._wakeup.set()
+
+    def is_open(self, word):
+        return EnrichmentJob.objects.filter(word=word, status__in=OPEN_STATUSES).exists()
+
+    def claim(self):
+        now = timezone.now()
+        due = (
+            EnrichmentJob.objects
+            .filter(Q(status='PENDING', run_after__lte=now)
+                    | Q(status='RUNNING', updated_at__lt=now - timedelta(seconds=LEASE_SECONDS)))
+            .order_by('run_after')
+            .values_list('id', 'status', 'updated_at')[:self.batch_size]
+        )
+        claimed = [
+            job_id for job_id, status, updated_at in due
+            # Only if nobody else claimed it since we read it
+            if EnrichmentJob.objects.filter(id=job_id, status=status, updated_at=updated_at)
+            .update(status='RUNNING', attempts=F('attempts') + 1, updated_at=now)
+        ]
+        return list(EnrichmentJob.objects.filter(id__in=claimed))
+
+    def run_once(self):
+        """Claim and run one batch of due jobs; returns how many were run."""
+        from .views import gemini_to_data, record_undefined, store_word_data
+
+        jobs = self.claim()
+        if not jobs:
+            return 0
+        with time_tier('gemini'):
+            answers = providers.get('gemini').lookup_many([job.word.lower() for job in jobs])
+        count_lookup('gemini', 'hit', len(answers))
+        count_lookup('gemini', 'miss', len(jobs) - len(answers))
+
+        now = timezone.now()
+        for job in jobs:
+            ai_data = answers.get(job.word.lower())
+            if ai_data is not None:
+                store_word_data(job.word, gemini_to_data(ai_data))
+                job.status, job.last_error = 'DONE', ''
+            elif job.attempts >= self.max_attempts:
+                job.status, job.last_error = 'FAILED', "Gemini gave no definition"
+                if not DictionaryEntry.objects.filter(word=job.word).exists():
+                    record_undefined([job.word])
+            else:
+                job.status, job.last_error = 'PENDING', "Gemini gave no definition"
+                job.run_after = now + timedelta(seconds=self.retry_delay * 2 ** (job.attempts - 1))
+            job.updated_at = now
+        EnrichmentJob.objects.bulk_update(jobs, ['status', 'last_error', 'run_after', 'updated_at'])
+        return len(jobs)
+
+    def run_forever(self, idle_poll=IDLE_POLL_SECONDS):
+        while True:
+            try:
+                ran = self.run_once()
+            except Exception:
+                logger.exception("Enrichment batch failed")
+                ran = 0
+            if not ran:
+                self._wakeup.wait(idle_poll)
+                self._wakeup.clear()
+
+    def _ensure_thread(self):
+        # Started lazily so forked workers get their own
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='enrichment-runner', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        try:
+            self.run_forever()
+        finally:
+            connections.close_all()
+
+
+enrichment = EnrichmentRunner(
+    batch_size=settings.ENRICHMENT_BATCH_SIZE,
+    max_attempts=settings.ENRICHMENT_MAX_ATTEMPTS,
+    retry_delay=settings.ENRICHMENT_RETRY_DELAY,
+    in_process=settings.ENRICHMENT_IN_PROCESS,
+)
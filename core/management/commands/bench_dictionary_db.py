@@ -0,0 +1,121 @@
+import multiprocessing
+import random
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+from django.test import override_settings
+
+from core.benchmarks import percentile, pseudo_words, throwaway_databases
+from core.dictionary_db import dictionary_models
+from core.models import DictionaryEntry, Video, WatchHistory
+
+
+class Command(BaseCommand):
+    help = (
+        "Time dictionary lookups (afetch_word_data's database tier) while other processes flush watch "
+        "progress into WatchHistory, with the dictionary in its own WAL database and, as before "
+        "the router, in the default database beside the writes. Runs in throwaway databases."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--words', type=int, default=20000, help="Dictionary entries (default 20000).")
+        parser.add_argument('--lookups', type=int, default=1000, help="Timed lookups per run (default 1000).")
+        parser.add_argument('--writers', type=int, default=4, help="Processes flushing progress (default 4).")
+        parser.add_argument('--batch', type=int, default=200, help="Positions per flush (default 200).")
+        parser.add_argument('--pause', type=float, default=0.02,
+                            help="Seconds each writer waits between flushes (default 0.02).")
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--videos', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.options = options
+        rng = random.Random(options['seed'])
+        self.stdout.write(
+            f"{options['words']} entries, {options['lookups']} lookups per run; {options['writers']} writer(s) "
+            f"upserting {options['batch']} positions per flush, {options['pause'] * 1000:.0f}ms apart."
+        )
+        self.stdout.write(
+            f"  {'dictionary in':<16} {'writers':>7} {'p50':>8} {'p95':>8} {'max':>8} {'failed':>7} {'flushes/s':>10}"
+        )
+        with tempfile.TemporaryDirectory() as root, throwaway_databases(root):
+            words = self.seed(rng)
+            # As before the router: the dictionary tables in db.sqlite3, which takes the progress writes too
+            with connections['default'].schema_editor() as editor:
+                for model in dictionary_models():
+                    editor.create_model(model)
+            DictionaryEntry.objects.using('default').bulk_create(
+                DictionaryEntry(word=word, definition=f"meaning of {word}") for word in words
+            )
+            for name, routers in [('own database', settings.DATABASE_ROUTERS), ('default', [])]:
+                with override_settings(DATABASE_ROUTERS=routers):
+                    for writers in (0, options['writers']):
+                        self.report(name, writers, *self.run(rng, words, writers))
+
+    def seed(self, rng):
+        users = User.objects.bulk_create(User(username=f"bench{i}") for i in range(self.options['users']))
+        videos = Video.objects.bulk_create(
+            Video(title=f"Bench {i}", video_file='videos/bench.mp4') for i in range(self.options['videos'])
+        )
+        self.pairs = [(user.id, video.id) for user in users for video in videos]
+        words = [word.upper() for word in pseudo_words(rng, self.options['words'])]
+        DictionaryEntry.objects.bulk_create(DictionaryEntry(word=word, definition=f"meaning of {word}") for word in words)
+        return words
+
+    def run(self, rng, words, writers):
+        # Separate processes, like the workers of a deployment, so they contend for the file and not the GIL
+        context = multiprocessing.get_context('fork')
+        stop, flushes = context.Event(), context.Value('i', 0)
+        connections.close_all()
+        processes = [
+            context.Process(target=self.write_progress, args=(rng.random(), stop, flushes), daemon=True)
+            for _ in range(writers)
+        ]
+        for process in processes:
+            process.start()
+        samples, failed = [], 0
+        started = time.perf_counter()
+        try:
+            for word in rng.choices(words, k=self.options['lookups']):
+                before = time.perf_counter()
+                try:
+                    DictionaryEntry.objects.filter(word=word).first()
+                except OperationalError:
+                    # "database is locked": the lookup waited out the whole busy timeout
+                    failed += 1
+                samples.append(time.perf_counter() - before)
+        finally:
+            stop.set()
+            for process in processes:
+                process.join()
+        return samples, failed, flushes.value / (time.perf_counter() - started)
+
+    def write_progress(self, seed, stop, flushes):
+        # What ProgressBuffer.flush() writes, far more often than a real deployment would
+        rng = random.Random(seed)
+        while not stop.is_set():
+            rows = [
+                WatchHistory(user_id=user_id, video_id=video_id, last_position=rng.uniform(0, 3600))
+                for user_id, video_id in rng.sample(self.pairs, min(self.options['batch'], len(self.pairs)))
+            ]
+            try:
+                WatchHistory.objects.bulk_create(
+                    rows, update_conflicts=True, unique_fields=['user', 'video'],
+                    update_fields=['last_position', 'updated_at'],
+                )
+            except OperationalError:
+                continue
+            with flushes.get_lock():
+                flushes.value += 1
+            time.sleep(self.options['pause'])
+
+    def report(self, name, writers, samples, failed, flush_rate):
+        self.stdout.write(
+            f"  {name:<16} {writers:>7} {statistics.median(samples) * 1000:>6.2f}ms "
+            f"{percentile(samples, 0.95) * 1000:>6.2f}ms {max(samples) * 1000:>6.1f}ms {failed:>7} {flush_rate:>10.0f}"
+        )
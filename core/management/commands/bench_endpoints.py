@@ -0,0 +1,85 @@
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from core.benchmarks import BenchmarkError, EndpointBenchmark, compare, throwaway_databases
+from core.cache import definition_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the hot endpoints (home, search, watch_video, get_definition cold/warm, "
+        "update_history, handle_vote, save_note, save_word, saved_list) against a synthetic library in a throwaway "
+        "database, with a stubbed Gemini. Reports p50/p95 latency, throughput and queries per request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--videos', type=int, default=10)
+        parser.add_argument('--cues', type=int, default=2000, help="Cues in each generated SRT file (default 2000).")
+        parser.add_argument('--notes', type=int, default=1000)
+        parser.add_argument('--saved', type=int, default=200, help="Saved words per user (default 200).")
+        parser.add_argument('--requests', type=int, default=50, help="Timed requests per endpoint (default 50).")
+        parser.add_argument('--model-latency', type=float, default=0.05,
+                            help="Seconds the stub model takes per prompt (default 0.05).")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="Write the results to this JSON file.")
+        parser.add_argument('--baseline', help="Compare with a JSON file written earlier by --output.")
+        parser.add_argument('--tolerance', type=float, default=0.5,
+                            help="Allowed p50 slowdown over the baseline, as a fraction (default 0.5).")
+
+    def handle(self, *args, **options):
+        benchmark = EndpointBenchmark(
+            users=options['users'], videos=options['videos'], cues=options['cues'], notes=options['notes'],
+            saved=options['saved'], requests=options['requests'], model_latency=options['model_latency'], seed=options['seed'],
+        )
+        self.stdout.write(
+            f"{options['users']} users, {options['videos']} videos of {options['cues']} cues, "
+            f"{options['notes']} notes, {options['saved']} saved words per user; "
+            f"{options['requests']} requests per endpoint, one at a time."
+        )
+        self.stdout.write(f"  {'endpoint':<26} {'p50':>8} {'p95':>8} {'max':>8} {'req/s':>7} {'queries':>8}")
+        try:
+            results = self.run_isolated(benchmark)
+        except BenchmarkError as e:
+            raise CommandError(str(e))
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+
+        if options['baseline']:
+            with open(options['baseline'], 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+            if baseline.get('config') != results['config']:
+                self.stdout.write(self.style.WARNING("The baseline was run with other options; compare with care."))
+            regressions = compare(results, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError("Endpoint regression:\n  " + "\n  ".join(regressions))
+            self.stdout.write(self.style.SUCCESS("Within tolerance of the baseline."))
+
+    def report(self, name, result):
+        self.stdout.write(
+            f"  {name:<26} {result['p50_ms']:>6.1f}ms {result['p95_ms']:>6.1f}ms {result['max_ms']:>6.1f}ms "
+            f"{result['rps']:>7.0f} {result['queries_per_request']:>8.1f}"
+        )
+
+    def run_isolated(self, benchmark):
+        """Run in new test databases, media directory and cache, all thrown away afterwards."""
+        with tempfile.TemporaryDirectory() as root, throwaway_databases(root):
+            definition_cache.local.clear()
+            try:
+                with override_settings(
+                    # The test client sends Host: testserver
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                    MEDIA_ROOT=os.path.join(root, 'media'),
+                    CUE_INDEX_DIR=os.path.join(root, 'cues'),
+                    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench'}},
+                ):
+                    return benchmark.run(progress=self.report)
+            finally:
+                definition_cache.local.clear()
@@ -0,0 +1,96 @@
+import random
+import tempfile
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+from core.benchmarks import pseudo_words, throwaway_databases
+from core.exports import EXPORTS, FORMATS, encode
+from core.models import DictionaryEntry, SavedWord, Video, VideoNote
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the streaming exports of saved words and notes against list size, in throwaway "
+        "databases: time, bytes sent and the peak Python memory while streaming, next to building "
+        "the same file in memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help="Rows of each kind to export (default 1000 10000 100000).")
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--no-gzip', action='store_true', help="Ask for the export uncompressed.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    # The test client sends Host: testserver. With DEBUG every query's SQL would be kept, and counted.
+    @override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], DEBUG=False)
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        encoding = 'identity' if options['no_gzip'] else 'gzip'
+        self.stdout.write(f"{options['format']} exports, Accept-Encoding: {encoding}.")
+        self.stdout.write(
+            f"  {'kind':<6} {'rows':>7} {'seconds':>8} {'rows/s':>8} {'sent KiB':>9}   "
+            f"{'streamed peak':>13} {'in memory peak':>14}"
+        )
+        with tempfile.TemporaryDirectory() as root, throwaway_databases(root):
+            user = User.objects.create_user('bench')
+            client = Client()
+            client.force_login(user)
+            video = Video.objects.create(title="Bench", video_file='videos/bench.mp4')
+            vocabulary = pseudo_words(rng, 5000)
+            # Numbered, so there are as many distinct words as the largest size needs
+            words = [f"{rng.choice(vocabulary)}{i}".upper() for i in range(max(options['sizes']))]
+            rows = 0
+            for size in sorted(options['sizes']):
+                new = words[rows:size]
+                DictionaryEntry.objects.bulk_create(
+                    DictionaryEntry(word=w, definition=f"meaning of {w.lower()}, " * 4, synonyms='one,two,three')
+                    for w in new
+                )
+                SavedWord.objects.bulk_create(SavedWord(user=user, word=w) for w in new)
+                VideoNote.objects.bulk_create(
+                    VideoNote(user=user, video=video, content=' '.join(rng.sample(vocabulary, 12)),
+                              timestamp=rng.uniform(0, 7200))
+                    for _ in new
+                )
+                rows = size
+                for kind in ('words', 'notes'):
+                    self.report(kind, size, *self.stream(client, kind, options['format'], encoding),
+                                self.in_memory(user, kind, options['format']))
+
+    def stream(self, client, kind, fmt, encoding):
+        """Seconds and bytes of one export, then the peak memory of another (tracing slows it down)."""
+        started = time.perf_counter()
+        sent = self.download(client, kind, fmt, encoding)
+        elapsed = time.perf_counter() - started
+        tracemalloc.start()
+        self.download(client, kind, fmt, encoding)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return elapsed, sent, peak
+
+    def download(self, client, kind, fmt, encoding):
+        response = client.get(f"/my-list/export/{kind}/", {'format': fmt}, HTTP_ACCEPT_ENCODING=encoding)
+        sent = sum(len(chunk) for chunk in response.streaming_content)
+        response.close()
+        return sent
+
+    def in_memory(self, user, kind, fmt):
+        # What rendering the export through a template would hold: every row, then the whole file
+        make_rows, fields = EXPORTS[kind]
+        tracemalloc.start()
+        b''.join(encode(list(make_rows(user)), fields, fmt))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+
+    def report(self, kind, rows, elapsed, sent, peak, in_memory_peak):
+        self.stdout.write(
+            f"  {kind:<6} {rows:>7} {elapsed:>8.2f} {rows / elapsed:>8.0f} {sent / 1024:>9.0f}   "
+            f"{peak / 2 ** 20:>10.1f}MiB {in_memory_peak / 2 ** 20:>11.1f}MiB"
+        )
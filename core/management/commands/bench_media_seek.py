@@ -0,0 +1,70 @@
+import os
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.views.static import serve
+
+from core.streaming import STREAM_BLOCK_SIZE, serve_file
+
+# Bytes a player needs past the seek point before it can decode a frame (roughly one keyframe)
+FRAME_BYTES = 256 * 1024
+
+
+def time_to_frame(response, offset):
+    """Seconds until the response body has delivered FRAME_BYTES past byte `offset` of the body."""
+    started = time.perf_counter()
+    received = 0
+    needed = offset + FRAME_BYTES
+    try:
+        for chunk in response.streaming_content:
+            received += len(chunk)
+            if received >= needed:
+                break
+    finally:
+        response.close()
+    return time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare time-to-first-frame after a seek: the old static serve (whole file from byte 0) "
+        "against stream_media's Range responses, on a synthetic file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=256, help="Size of the synthetic video (default 256).")
+        parser.add_argument('--seeks', type=float, nargs='+', default=[0.1, 0.5, 0.9],
+                            help="Seek points as fractions of the file (default 0.1 0.5 0.9).")
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        size = options['size_mb'] * 1024 * 1024
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, 'bench.mp4')
+            with open(path, 'wb') as f:
+                block = os.urandom(STREAM_BLOCK_SIZE)
+                for _ in range(size // len(block)):
+                    f.write(block)
+
+            self.stdout.write(f"{options['size_mb']} MiB file, {FRAME_BYTES // 1024} KiB needed past the seek point.")
+            self.stdout.write(f"  {'seek':>5} {'static serve':>13} {'range':>9}")
+            for fraction in options['seeks']:
+                offset = int(size * fraction)
+                static, ranged = [], []
+                for _ in range(options['repeat']):
+                    # Old: no Range support, so the player reads from byte 0 up to the seek point
+                    static.append(time_to_frame(serve(factory.get('/media/bench.mp4'), 'bench.mp4', root), offset))
+                    request = factory.get('/media/bench.mp4', HTTP_RANGE=f'bytes={offset}-')
+                    ranged.append(time_to_frame(serve_file(request, path), 0))
+                self.stdout.write(
+                    f"  {fraction:>5.0%} {statistics.median(static) * 1000:>11.1f}ms "
+                    f"{statistics.median(ranged) * 1000:>7.2f}ms"
+                )
+        self.stdout.write(
+            "Both are timed in-process without a network; under gunicorn/uWSGI the range body "
+            "is sent with os.sendfile instead."
+        )
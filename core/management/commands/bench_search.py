@@ -0,0 +1,85 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.models import Video
+from core.search import FTS5Backend
+from core.subtitles import cue_index_for_video
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * pct), len(ordered) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure search latency against library size: builds synthetic libraries from the "
+        "existing subtitles (inside a transaction that is rolled back) and times FTS5 search "
+        "next to the old title__icontains scan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000],
+                            help="Library sizes (videos) to measure (default 10 100 1000).")
+        parser.add_argument('--queries', type=int, default=50, help="Queries per size (default 50).")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        sources = []
+        for video in Video.objects.exclude(subtitle_file='').order_by('id'):
+            index = cue_index_for_video(video)
+            if len(index):
+                sources.append([(start, ' '.join(words)) for start, words in zip(index.starts, index.words)])
+        if not sources:
+            raise CommandError("No subtitled videos to build a synthetic library from.")
+
+        rng = random.Random(options['seed'])
+        words = (w.strip('.,!?"\'').lower() for cues in sources for _, text in cues for w in text.split())
+        vocabulary = sorted({w for w in words if len(w) >= 4 and w.isalpha()})
+        queries = [rng.choice(vocabulary) for _ in range(options['queries'])]
+        backend = FTS5Backend()
+
+        self.stdout.write(f"{len(sources)} subtitle file(s) as source, {len(queries)} queries per size.")
+        self.stdout.write(
+            f"  {'videos':>7} {'cue rows':>9} {'index s':>8}   "
+            f"{'fts5 p50':>9} {'p95':>7}   {'icontains p50':>13} {'p95':>7}"
+        )
+        with transaction.atomic():
+            videos = []
+            cue_rows = 0
+            index_seconds = 0.0
+            for size in sorted(options['sizes']):
+                new = Video.objects.bulk_create([
+                    Video(title=f"Bench {i} {rng.choice(vocabulary)}", description=' '.join(rng.sample(vocabulary, 8)),
+                          video_file='videos/bench.mp4')
+                    for i in range(len(videos), size)
+                ])
+                started = time.perf_counter()
+                for video in new:
+                    cues = sources[video.id % len(sources)]
+                    backend.index(video.id, video.title, video.description, cues, f"bench:{video.id}")
+                    cue_rows += len(cues)
+                index_seconds += time.perf_counter() - started
+                videos.extend(new)
+
+                fts, scan = [], []
+                for q in queries:
+                    started = time.perf_counter()
+                    backend.search(q)
+                    fts.append(time.perf_counter() - started)
+                    started = time.perf_counter()
+                    list(Video.objects.filter(title__icontains=q).values_list('id', flat=True))
+                    scan.append(time.perf_counter() - started)
+
+                self.stdout.write(
+                    f"  {len(videos):>7} {cue_rows:>9} {index_seconds:>8.2f}   "
+                    f"{statistics.median(fts) * 1000:>7.2f}ms {percentile(fts, 0.95) * 1000:>5.2f}ms   "
+                    f"{statistics.median(scan) * 1000:>11.2f}ms {percentile(scan, 0.95) * 1000:>5.2f}ms"
+                )
+            # Nothing the benchmark created is kept
+            transaction.set_rollback(True)
+        self.stdout.write("Note: icontains only searches titles; FTS5 also searches descriptions and every cue.")
@@ -0,0 +1,84 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter: time and RSS to import the URLconf (which pulls in
+# core.views), then again after every lookup backend has been preloaded.
+PROBE = r"""
+import json, os, time
+def rss_kb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+t0 = time.perf_counter()
+import django
+django.setup()
+import hoverlearn.urls  # noqa: F401
+t1 = time.perf_counter()
+rss_import = rss_kb()
+from core import providers
+providers.preload()
+t2 = time.perf_counter()
+print(json.dumps({
+    'import_seconds': t1 - t0,
+    'rss_kb_after_import': rss_import,
+    'preload_seconds': t2 - t1,
+    'rss_kb_after_preload': rss_kb(),
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure worker startup: import time and RSS of a fresh process loading the URLconf, "
+        "before and after preloading the lookup backends."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help="Fresh processes to measure (default 5).")
+        parser.add_argument('--output', help="Write the median results to this JSON file.")
+        parser.add_argument('--baseline', help="Compare with a JSON file written earlier by --output.")
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help="Allowed slowdown/growth over the baseline, as a fraction (default 0.25).")
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'hoverlearn.settings'))
+        samples = []
+        for _ in range(options['runs']):
+            out = subprocess.run(
+                [sys.executable, '-c', PROBE], cwd=settings.BASE_DIR, env=env,
+                capture_output=True, text=True,
+            )
+            if out.returncode != 0:
+                raise CommandError(out.stderr)
+            samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+        results = {key: statistics.median(s[key] for s in samples) for key in samples[0]}
+        self.stdout.write(f"Median of {len(samples)} run(s):")
+        self.stdout.write(f"  import:  {results['import_seconds'] * 1000:8.1f} ms   RSS {results['rss_kb_after_import'] / 1024:7.1f} MB")
+        self.stdout.write(f"  preload: {results['preload_seconds'] * 1000:8.1f} ms   RSS {results['rss_kb_after_preload'] / 1024:7.1f} MB")
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+
+        if options['baseline']:
+            with open(options['baseline'], 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+            limit = 1 + options['tolerance']
+            regressions = [
+                f"{key}: {results[key]:.4g} vs baseline {baseline[key]:.4g}"
+                for key in ('import_seconds', 'rss_kb_after_import')
+                if key in baseline and results[key] > baseline[key] * limit
+            ]
+            if regressions:
+                raise CommandError("Startup regression:\n  " + "\n  ".join(regressions))
+            self.stdout.write(self.style.SUCCESS("Within tolerance of the baseline."))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Video
+from core.subtitles import build_cue_index
+
+
+class Command(BaseCommand):
+    help = "Re-parse subtitle files and rebuild their cached cue indexes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--video', type=int, help="Only rebuild the index for this video id.")
+
+    def handle(self, *args, **options):
+        videos = Video.objects.exclude(subtitle_file='').order_by('id')
+        if options['video']:
+            videos = videos.filter(id=options['video'])
+            if not videos.exists():
+                raise CommandError(f"Video {options['video']} not found or has no subtitle file.")
+
+        built = 0
+        for video in videos:
+            try:
+                index = build_cue_index(video.subtitle_file.path)
+            except OSError as e:
+                self.stderr.write(f"[{video.id}] {video.title}: {e}")
+                continue
+            built += 1
+            self.stdout.write(f"[{video.id}] {video.title}: {len(index)} cues")
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {built} cue index(es)."))
@@ -0,0 +1,72 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.models import Video
+from core.thumbnails import record_variants, render_variants
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the WebP thumbnail variants (settings.THUMBNAIL_WIDTHS) of every video whose "
+        "thumbnail has none yet, or changed since they were made, in a pool of worker processes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Render every thumbnail again.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help="Worker processes (default: one per CPU).")
+        parser.add_argument('--prune', action='store_true',
+                            help="Afterwards delete derived files no video refers to any more.")
+
+    def handle(self, *args, **options):
+        videos = [
+            video for video in Video.objects.exclude(thumbnail='').exclude(thumbnail__isnull=True).order_by('id')
+            if options['force'] or not video.current_thumbnail_variants()
+        ]
+        self.stdout.write(f"{len(videos)} thumbnail(s) to render with {options['workers']} worker(s).")
+
+        rendered = failed = 0
+        if videos:
+            # Workers only touch files; don't let them inherit open database connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+                jobs = {pool.submit(render_variants, video.thumbnail.name): video for video in videos}
+                for job in as_completed(jobs):
+                    video = jobs[job]
+                    try:
+                        variants = job.result()
+                    except Exception as e:
+                        failed += 1
+                        self.stderr.write(f"  {video.id} {video.thumbnail.name}: {e}")
+                        continue
+                    record_variants(video, video.thumbnail.name, variants)
+                    rendered += 1
+                    self.stdout.write(f"  {video.id} {video.title}: {', '.join(f'{w}w' for w, _ in variants)}")
+
+        if options['prune']:
+            self.prune()
+        style = self.style.SUCCESS if not failed else self.style.WARNING
+        self.stdout.write(style(f"{rendered} rendered, {failed} failed."))
+
+    def prune(self):
+        referenced = {
+            name
+            for variants in Video.objects.values_list('thumbnail_variants', flat=True)
+            for _, name in (variants or {}).get('variants', [])
+        }
+        try:
+            _, files = default_storage.listdir(settings.THUMBNAIL_DERIVED_DIR)
+        except FileNotFoundError:
+            return
+        removed = 0
+        for filename in files:
+            name = f"{settings.THUMBNAIL_DERIVED_DIR}/{filename}"
+            if name not in referenced:
+                default_storage.delete(name)
+                removed += 1
+        self.stdout.write(f"Pruned {removed} unreferenced file(s).")
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.wordnet_table import build_table
+
+
+class Command(BaseCommand):
+    help = (
+        "Export WordNet (first definition and top synonyms per lemma, plus irregular forms) "
+        "into the SQLite table the dictionary's fallback tier reads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=str(settings.WORDNET_TABLE_PATH),
+                            help="Where to write the table (default: settings.WORDNET_TABLE_PATH).")
+
+    def handle(self, *args, **options):
+        # The corpus is only ever loaded here, at build time
+        from nltk.corpus import wordnet
+        try:
+            wordnet.ensure_loaded()
+        except LookupError:
+            raise CommandError("The NLTK WordNet corpus is missing; run `python -m nltk.downloader wordnet` first.")
+
+        lemmas, exceptions = build_table(
+            options['output'], wordnet,
+            progress=lambda i: self.stdout.write(f"  {i} lemmas..."),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {lemmas} lemmas and {exceptions} irregular forms to {options['output']}. "
+            f"Restart workers to pick up a rebuilt table."
+        ))
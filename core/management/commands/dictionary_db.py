@@ -0,0 +1,58 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.cache import definition_cache
+from core.dictionary_db import DictionaryFileError, copy_from_default, export_dictionary, import_dictionary
+from core.routers import WRITE_ALIAS
+
+
+class Command(BaseCommand):
+    help = (
+        "Ship the dictionary database as a prebuilt file so new nodes start warm: export a "
+        "snapshot, import one (with the app stopped), or copy the rows of an install from "
+        "before the dictionary had its own database."
+    )
+
+    def add_arguments(self, parser):
+        actions = parser.add_subparsers(dest='action', required=True)
+        export = actions.add_parser('export', help="Write a snapshot of the dictionary database to a file.")
+        export.add_argument('path')
+        load = actions.add_parser('import', help="Replace the dictionary database with a file written by export.")
+        load.add_argument('path')
+        actions.add_parser('copy-from-default', help="Copy dictionary rows left in the default database.")
+
+    def handle(self, *args, **options):
+        if WRITE_ALIAS not in connections:
+            raise CommandError(f"No '{WRITE_ALIAS}' database is configured.")
+        try:
+            if options['action'] == 'export':
+                counts = export_dictionary(options['path'])
+                self.stdout.write(self.style.SUCCESS(f"Exported {self.describe(counts)} to {options['path']}."))
+            elif options['action'] == 'import':
+                self.load(options['path'])
+            else:
+                counts = copy_from_default()
+                if all(rows is None for rows in counts.values()):
+                    self.stdout.write("The default database has no dictionary tables; nothing to copy.")
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"Copied {self.describe(counts)}."))
+        except DictionaryFileError as e:
+            raise CommandError(str(e))
+
+    def load(self, path):
+        target = connections[WRITE_ALIAS].settings_dict['NAME']
+        if connections[WRITE_ALIAS].vendor != 'sqlite' or str(target).startswith(':memory:'):
+            raise CommandError("Only a SQLite dictionary database on disk can be replaced by a file.")
+        connections.close_all()
+        counts = import_dictionary(path, target)
+        # A file exported by an older release gets the migrations since
+        call_command('migrate', database=WRITE_ALIAS, verbosity=0)
+        # Cached definitions may disagree with the new file; the shared cache also serves other nodes
+        definition_cache.local.clear()
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {self.describe(counts)} into {target}. Restart workers to pick up the new file."
+        ))
+
+    def describe(self, counts):
+        return ', '.join(f"{rows} {table}" for table, rows in counts.items() if rows is not None)
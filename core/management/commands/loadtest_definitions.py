@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, override_settings
+
+from core import providers
+from core.benchmarks import StubModel
+from core.cache import definition_cache
+from core.gemini import GeminiBatcher
+from core.models import DictionaryEntry, UndefinedWord
+from core.text import word_key
+
+# Seconds between the unrelated requests sent while the lookups wait
+PROBE_INTERVAL = 0.05
+
+
+def summary(samples):
+    ordered = sorted(samples)
+    p95 = ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)]
+    return f"p50 {statistics.median(ordered) * 1000:7.1f}ms  p95 {p95 * 1000:7.1f}ms  max {ordered[-1] * 1000:7.1f}ms"
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test get_definition against a stubbed slow Gemini: fire many lookups of unknown "
+        "words, then time an unrelated page (/login/) while they wait. Compares the async view "
+        "under ASGI with a fixed pool of WSGI worker threads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lookups', type=int, default=64, help="Concurrent lookups of unknown words (default 64).")
+        parser.add_argument('--latency', type=float, default=2.0, help="Seconds the stub model takes per prompt (default 2).")
+        parser.add_argument('--workers', type=int, default=8, help="WSGI worker threads to compare with (default 8).")
+        parser.add_argument('--probes', type=int, default=20, help="Unrelated requests to time (default 20).")
+
+    # The test clients send Host: testserver. Lookups must wait on the model, not be queued for enrichment.
+    @override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], DEFINITION_ENRICH_IN_BACKGROUND=False)
+    def handle(self, *args, **options):
+        self.options = options
+        self.words = []
+        previous = providers._instances.get('gemini')
+        # Failed lookups are counted below rather than logged one traceback at a time
+        request_logger = logging.getLogger('django.request')
+        request_logger.disabled = True
+        try:
+            self.stdout.write(
+                f"{options['lookups']} lookups of unknown words against a model taking {options['latency']}s "
+                f"per prompt; {options['probes']} GET /login/ sent meanwhile, every {PROBE_INTERVAL * 1000:.0f}ms."
+            )
+            baseline = self.probe_alone()
+            self.stdout.write(f"  {'no load':<32} {summary(baseline)}")
+            for name, run in [('ASGI, async view', self.run_asgi), (f"WSGI, {options['workers']} workers", self.run_wsgi)]:
+                self.install_model()
+                probes, answered = run()
+                self.stdout.write(f"  {name:<32} {summary(probes)}   ({answered}/{options['lookups']} lookups answered)")
+        finally:
+            if previous is None:
+                providers.reset('gemini')
+            else:
+                providers._instances['gemini'] = previous
+            request_logger.disabled = False
+            self.cleanup()
+
+    def install_model(self):
+        providers._instances['gemini'] = GeminiBatcher(StubModel(self.options['latency']), max_wait=0.01)
+
+    def next_words(self):
+        # Fresh nonsense words each run, so every lookup misses the caches
+        start = len(self.words)
+        words = [f"zzload{chr(97 + i // 26 % 26)}{chr(97 + i % 26)}q" for i in range(start, start + self.options['lookups'])]
+        self.words.extend(words)
+        return words
+
+    def probe_alone(self):
+        client = Client()
+        samples = []
+        for _ in range(self.options['probes']):
+            started = time.perf_counter()
+            client.get('/login/')
+            samples.append(time.perf_counter() - started)
+        return samples
+
+    def run_asgi(self):
+        async def timed(client, path):
+            started = time.perf_counter()
+            response = await client.get(path)
+            return time.perf_counter() - started, response
+
+        async def scenario():
+            client = AsyncClient(raise_request_exception=False)
+            lookups = [asyncio.create_task(timed(client, f'/get-def/{w}/')) for w in self.next_words()]
+            probes = []
+            for _ in range(self.options['probes']):
+                await asyncio.sleep(PROBE_INTERVAL)
+                probes.append(asyncio.create_task(timed(client, '/login/')))
+            probes = await asyncio.gather(*probes)
+            lookups = await asyncio.gather(*lookups)
+            return [t for t, _ in probes], sum(r.status_code == 200 and b'meaning of' in r.content for _, r in lookups)
+        return asyncio.run(scenario())
+
+    def run_wsgi(self):
+        def timed(path, submitted):
+            # Time spent queued for a free worker counts: that is what a visitor waits for
+            response = Client(raise_request_exception=False).get(path)
+            return time.perf_counter() - submitted, response
+
+        with ThreadPoolExecutor(max_workers=self.options['workers']) as pool:
+            lookups = [pool.submit(timed, f'/get-def/{w}/', time.perf_counter()) for w in self.next_words()]
+            probes = []
+            for _ in range(self.options['probes']):
+                time.sleep(PROBE_INTERVAL)
+                probes.append(pool.submit(timed, '/login/', time.perf_counter()))
+            samples = [f.result()[0] for f in probes]
+            answered = sum(r.status_code == 200 and b'meaning of' in r.content for _, r in (f.result() for f in lookups))
+        return samples, answered
+
+    def cleanup(self):
+        keys = [word_key(w) for w in self.words]
+        DictionaryEntry.objects.filter(word__in=keys).delete()
+        UndefinedWord.objects.filter(word__in=keys).delete()
+        for key in keys:
+            definition_cache.delete(key)
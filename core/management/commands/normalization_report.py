@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import DictionaryEntry, Video
+from core.subtitles import decode, parse_srt
+from core.text import word_key
+
+# Keeps `word__in` queries under SQLite's bound-parameter limit
+QUERY_CHUNK = 500
+
+
+def legacy_key(word):
+    """The key used before core/text.py: alphanumerics of the raw token, upper-cased."""
+    return ''.join(e for e in word if e.isalnum()).upper()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare definition-cache hit rates on the subtitle corpus before and after word "
+        "normalization: raw tokens, the old alphanumeric keys and the normalized lemma keys."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--video', type=int, help="Only count the subtitles of this video id.")
+
+    def handle(self, *args, **options):
+        videos = Video.objects.exclude(subtitle_file='').order_by('id')
+        if options['video']:
+            videos = videos.filter(id=options['video'])
+            if not videos.exists():
+                raise CommandError(f"Video {options['video']} not found or has no subtitle file.")
+
+        # Raw tokens as the old parser split them, markup included
+        tokens = []
+        for video in videos:
+            try:
+                with open(video.subtitle_file.path, 'rb') as f:
+                    text = decode(f.read())
+            except OSError as e:
+                self.stderr.write(f"Skipping video {video.id}: {e}")
+                continue
+            for _, _, words in parse_srt(text, keep_markup=True):
+                tokens.extend(words)
+        if not tokens:
+            raise CommandError("No subtitle words found.")
+
+        # The raw token was the old per-process lru_cache key; the others are DictionaryEntry keys
+        schemes = [
+            ('raw token', lambda w: w),
+            ('old key', legacy_key),
+            ('normalized', word_key),
+        ]
+        self.stdout.write(f"{len(tokens)} subtitle tokens in {videos.count()} video(s).")
+        self.stdout.write(f"  {'scheme':<12} {'distinct':>9} {'hit rate':>9} {'in DB':>7}")
+        for name, key_func in schemes:
+            keys = [key for key in map(key_func, tokens) if key]
+            distinct = list(dict.fromkeys(keys))
+            # Every distinct key misses once; every repeat is a hit in an unbounded cache
+            hit_rate = 1 - len(distinct) / len(keys)
+            if key_func is legacy_key or key_func is word_key:
+                stored = set()
+                for i in range(0, len(distinct), QUERY_CHUNK):
+                    stored.update(
+                        DictionaryEntry.objects.filter(word__in=distinct[i:i + QUERY_CHUNK])
+                        .values_list('word', flat=True)
+                    )
+                in_db = f"{sum(1 for key in keys if key in stored) / len(keys):.1%}"
+            else:
+                in_db = '-'
+            self.stdout.write(f"  {name:<12} {len(distinct):>9} {hit_rate:>8.1%} {in_db:>7}")
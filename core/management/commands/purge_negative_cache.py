@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+from django.utils import timezone
+
+from core.cache import definition_cache
+from core.models import UndefinedWord
+
+
+class Command(BaseCommand):
+    help = "Show negative-cache statistics and purge its entries so those words are looked up again."
+
+    def add_arguments(self, parser):
+        parser.add_argument('words', nargs='*', help="Only purge these words (default: everything).")
+        parser.add_argument('--expired', action='store_true', help="Only purge entries past their retry time.")
+        parser.add_argument('--stats', action='store_true', help="Print statistics without purging anything.")
+
+    def handle(self, *args, **options):
+        entries = UndefinedWord.objects.all()
+        totals = entries.aggregate(saved=Sum('saved_lookups'))
+        self.stdout.write(
+            f"{entries.count()} undefinable word(s) cached, "
+            f"{totals['saved'] or 0} slow lookup(s) saved so far."
+        )
+        if options['stats']:
+            return
+
+        if options['words']:
+            entries = entries.filter(word__in=[w.upper() for w in options['words']])
+        if options['expired']:
+            entries = entries.filter(retry_after__lte=timezone.now())
+        for word in entries.values_list('word', flat=True):
+            definition_cache.delete(word)
+        deleted, _ = entries.delete()
+        self.stdout.write(self.style.SUCCESS(f"Purged {deleted} entr{'y' if deleted == 1 else 'ies'}."))
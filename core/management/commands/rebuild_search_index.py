@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core import providers
+from core.models import Video
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the video search index (titles, descriptions and every subtitle cue). "
+        "Saving a video keeps it up to date; run this after migrating or restoring a database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--video', type=int, help="Only re-index this video id.")
+
+    def handle(self, *args, **options):
+        backend = providers.get('search')
+        videos = Video.objects.order_by('id')
+        if options['video']:
+            videos = videos.filter(id=options['video'])
+            if not videos.exists():
+                raise CommandError(f"Video {options['video']} not found.")
+
+        started = time.monotonic()
+        count = 0
+        # One transaction, so searches never see a half-built index
+        with transaction.atomic():
+            if not options['video']:
+                backend.clear()
+            for video in videos.iterator():
+                backend.index_video(video, force=True)
+                count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {count} video(s) with {type(backend).__name__} in {time.monotonic() - started:.2f}s."
+        ))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from core.models import Video, VideoVote
+
+
+def vote_total(vote):
+    """Subquery counting one kind of vote for the outer Video."""
+    votes = (
+        VideoVote.objects.filter(video=OuterRef('pk'), vote=vote)
+        .order_by().values('video').annotate(n=Count('pk')).values('n')
+    )
+    return Coalesce(Subquery(votes), 0)
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Video.like_count/dislike_count from VideoVote and fix any that drifted "
+        "(e.g. after votes were deleted in the admin or together with their user)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report the videos that are off.")
+
+    def handle(self, *args, **options):
+        videos = Video.objects.annotate(
+            likes=Count('votes', filter=Q(votes__vote='LIKE')),
+            dislikes=Count('votes', filter=Q(votes__vote='DISLIKE')),
+        ).order_by('id')
+        drifted = []
+        for video in videos:
+            if (video.like_count, video.dislike_count) != (video.likes, video.dislikes):
+                drifted.append(video.id)
+                self.stdout.write(
+                    f"  {video.id} {video.title}: {video.like_count}/{video.dislike_count} "
+                    f"-> {video.likes}/{video.dislikes}"
+                )
+
+        if drifted and not options['dry_run']:
+            # Recounted inside the UPDATE itself, so votes cast since the report are included
+            Video.objects.filter(id__in=drifted).update(
+                like_count=vote_total('LIKE'), dislike_count=vote_total('DISLIKE'),
+            )
+
+        verb = "would be fixed" if options['dry_run'] else "fixed"
+        self.stdout.write(self.style.SUCCESS(f"{len(drifted)} of {len(videos)} video(s) {verb}."))
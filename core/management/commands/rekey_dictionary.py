@@ -0,0 +1,107 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import router, transaction
+
+from core import providers
+from core.cache import definition_cache
+from core.models import DictionaryEntry, EnrichmentJob, SavedWord, UndefinedWord
+from core.text import word_key
+
+UPDATE_BATCH = 500
+# Which entry survives when several rows fold into one key
+SOURCE_RANK = {'common': 3, 'gemini': 2, 'wordnet': 1}
+
+
+class Command(BaseCommand):
+    help = (
+        "Move dictionary rows stored under old keys (inflected forms like RUNNING, or "
+        "punctuation from before normalization) to their core.text.word_key, merging rows "
+        "that end up on the same key. Covers DictionaryEntry, UndefinedWord, EnrichmentJob "
+        "and saved words. Run it after `build_wordnet_table`; it is safe to run again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report what would change without writing.")
+
+    def handle(self, *args, **options):
+        try:
+            providers.get('wordnet')
+        except LookupError:
+            self.stderr.write(
+                "No WordNet table: keys are only case- and punctuation-folded, not lemmatized. "
+                "Run `python manage.py build_wordnet_table` first to merge inflected forms."
+            )
+        self.dry_run = options['dry_run']
+        touched = set()
+        touched |= self.rekey(DictionaryEntry, lambda row: (SOURCE_RANK.get(row.source, 0), -row.id))
+        touched |= self.rekey(UndefinedWord, lambda row: (row.retry_after, -row.id), merge=self.merge_undefined)
+        touched |= self.rekey(EnrichmentJob, lambda row: (row.status != 'DONE', -row.id))
+        self.rekey(SavedWord, lambda row: -row.id, group=lambda row: row.user_id)
+        if self.dry_run:
+            self.stdout.write(self.style.SUCCESS("Dry run, nothing written."))
+            return
+
+        # A key that gained a definition is no longer "undefined"
+        touched = list(touched)
+        for i in range(0, len(touched), UPDATE_BATCH):
+            chunk = touched[i:i + UPDATE_BATCH]
+            defined = DictionaryEntry.objects.filter(word__in=chunk).values_list('word', flat=True)
+            UndefinedWord.objects.filter(word__in=list(defined)).delete()
+        # Both the old keys and the merged ones may hold stale lookups
+        for key in touched:
+            definition_cache.delete(key)
+        self.stdout.write(self.style.SUCCESS(f"Done; cleared {len(touched)} cached lookups."))
+
+    def rekey(self, model, rank, merge=None, group=lambda row: None):
+        """
+        Give every `model` row its word_key; within a key (and `group`), the row
+        with the highest `rank` is kept and `merge`d with the others, which are
+        deleted. Returns the old and new words of every row it changed.
+        """
+        by_key = defaultdict(list)
+        for row in model.objects.order_by('id').iterator(chunk_size=UPDATE_BATCH):
+            key = word_key(row.word)
+            by_key[group(row), key].append(row)
+
+        renamed, deleted, touched = [], [], set()
+        for (_, key), rows in by_key.items():
+            if len(rows) == 1 and rows[0].word == key:
+                continue
+            touched.update(row.word for row in rows)
+            touched.add(key)
+            rows.sort(key=rank, reverse=True)
+            keep, rest = rows[0], rows[1:]
+            if merge and rest:
+                merge(keep, rest)
+            deleted += [row.id for row in rest]
+            if not key:
+                # Nothing left to look up under
+                deleted.append(keep.id)
+            elif keep.word != key or (merge and rest):
+                keep.word = key
+                renamed.append(keep)
+
+        self.stdout.write(
+            f"  {model._meta.verbose_name_plural:<18} {len(renamed):>6} re-keyed, {len(deleted):>6} merged away"
+        )
+        touched.discard('')
+        if self.dry_run or not (renamed or deleted):
+            return touched
+        with transaction.atomic(using=router.db_for_write(model)):
+            model.objects.filter(id__in=deleted).delete()
+            # Through placeholder words first: one row's new key may be another's old one
+            fields = [f.name for f in model._meta.concrete_fields if f.name not in ('id', 'word')] + ['word']
+            final = {row.id: row.word for row in renamed}
+            for row in renamed:
+                row.word = f"\x00{row.id}"
+            model.objects.bulk_update(renamed, ['word'], batch_size=UPDATE_BATCH)
+            for row in renamed:
+                row.word = final[row.id]
+            model.objects.bulk_update(renamed, fields, batch_size=UPDATE_BATCH)
+        return touched
+
+    @staticmethod
+    def merge_undefined(keep, rest):
+        keep.failures = max(row.failures for row in [keep, *rest])
+        keep.saved_lookups = sum(row.saved_lookups for row in [keep, *rest])
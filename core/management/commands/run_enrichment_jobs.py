@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from core.jobs import enrichment
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the background Gemini enrichment jobs queued by hover lookups (see core/jobs.py). "
+        "Use with ENRICHMENT_IN_PROCESS = False to keep them out of the web workers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Run every due job, then exit.")
+
+    def handle(self, *args, **options):
+        if not options['once']:
+            self.stdout.write("Waiting for enrichment jobs (Ctrl+C to stop)...")
+            enrichment.run_forever()
+        total = 0
+        while ran := enrichment.run_once():
+            total += ran
+        self.stdout.write(self.style.SUCCESS(f"{total} job(s) run."))
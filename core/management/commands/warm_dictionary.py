@@ -0,0 +1,140 @@
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.cache import definition_cache
+from core.models import DictionaryEntry, EnrichmentJob, UndefinedWord, Video
+from core.subtitles import cue_index_for_video
+from core import providers
+from core.views import lookup_remote_many, record_undefined
+
+# Keeps `word__in` queries under SQLite's bound-parameter limit
+QUERY_CHUNK = 500
+
+
+class Command(BaseCommand):
+    help = (
+        "Pre-resolve every subtitle word into DictionaryEntry so the first hover on a new "
+        "video doesn't wait on Gemini/WordNet. Safe to interrupt: already stored words are "
+        "skipped when it runs again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--video', type=int, help="Only warm the words of this video id.")
+        parser.add_argument('--workers', type=int, default=4, help="Concurrent remote lookups (default 4).")
+        parser.add_argument('--chunk-size', type=int, default=100,
+                            help="Words per remote lookup and per bulk_create (default 100).")
+
+    def handle(self, *args, **options):
+        videos = Video.objects.exclude(subtitle_file='').order_by('id')
+        if options['video']:
+            videos = videos.filter(id=options['video'])
+            if not videos.exists():
+                raise CommandError(f"Video {options['video']} not found or has no subtitle file.")
+
+        keys = {}
+        for video in videos:
+            # The index already holds every word's normalized dictionary key
+            for cue_keys in cue_index_for_video(video).word_keys:
+                keys.update(dict.fromkeys(key for key in cue_keys if key))
+        keys = list(keys)
+
+        existing = set()
+        for i in range(0, len(keys), QUERY_CHUNK):
+            existing.update(
+                DictionaryEntry.objects.filter(word__in=keys[i:i + QUERY_CHUNK]).values_list('word', flat=True)
+            )
+        todo = [key for key in keys if key not in existing]
+        # Not known_undefined(): that counts hovers it answered, and warming skips no hover
+        undefined = set()
+        now = timezone.now()
+        for i in range(0, len(todo), QUERY_CHUNK):
+            undefined.update(
+                UndefinedWord.objects.filter(word__in=todo[i:i + QUERY_CHUNK], retry_after__gt=now)
+                .values_list('word', flat=True)
+            )
+        todo = [key for key in todo if key not in undefined]
+        self.stdout.write(
+            f"{len(keys)} distinct words, {len(existing)} already in the dictionary, "
+            f"{len(undefined)} known to be undefinable, {len(todo)} to resolve."
+        )
+
+        tiers = Counter(cached=len(existing), negative_cache=len(undefined))
+        started = time.monotonic()
+        done = 0
+
+        # 2. CUSTOM JSON needs no network, store those straight away
+        common_dict = providers.get('common_dict')
+        common = [key for key in todo if key in common_dict]
+        self.store([
+            (key, {'definition': common_dict[key], 'hindi': None, 'synonyms': [], 'source': 'common'}) for key in common
+        ])
+        tiers['common'] += len(common)
+        done += len(common)
+
+        # 3/4. Gemini -> WordNet for the rest, a chunk per pool task, stored as each chunk finishes
+        remote = [key.lower() for key in todo if key not in common_dict]
+        chunk_size = options['chunk_size']
+        chunks = [remote[i:i + chunk_size] for i in range(0, len(remote), chunk_size)]
+        executor = ThreadPoolExecutor(max_workers=options['workers'])
+        try:
+            futures = [executor.submit(lookup_remote_many, chunk) for chunk in chunks]
+            for future in as_completed(futures):
+                found = []
+                not_found = []
+                for clean_word, (data, tier) in future.result().items():
+                    tiers[tier or 'not_found'] += 1
+                    if tier:
+                        found.append((clean_word.upper(), data))
+                    else:
+                        not_found.append(clean_word.upper())
+                self.store(found)
+                record_undefined(not_found)
+                done += len(future.result())
+                self.progress(done, len(todo), started)
+        except KeyboardInterrupt:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.stderr.write(f"\nInterrupted after {done} words; run the command again to resume.")
+            return
+        executor.shutdown()
+
+        elapsed = time.monotonic() - started
+        rate = done / elapsed if elapsed > 0 else 0.0
+        self.stdout.write(self.style.SUCCESS(f"Resolved {done} words in {elapsed:.1f}s ({rate:.1f} words/sec)."))
+        for tier in ('cached', 'negative_cache', 'common', 'gemini', 'wordnet', 'not_found'):
+            self.stdout.write(f"  {tier:<15} {tiers[tier]}")
+
+    def store(self, items):
+        # bulk_create skips the post_save signal, so drop any cached "not found" answers ourselves
+        for key, data in items:
+            definition_cache.delete(key)
+        DictionaryEntry.objects.bulk_create(
+            [
+                DictionaryEntry(
+                    word=key,
+                    definition=data['definition'],
+                    hindi=data['hindi'],
+                    synonyms=",".join(data['synonyms']),
+                    source=data['source'],
+                )
+                for key, data in items
+            ],
+            batch_size=QUERY_CHUNK,
+            ignore_conflicts=True,
+        )
+        # As on a hover, a WordNet answer waits for Gemini's in the background (core/jobs.py)
+        if settings.DEFINITION_ENRICH_IN_BACKGROUND:
+            EnrichmentJob.objects.bulk_create(
+                [EnrichmentJob(word=key) for key, data in items if data['source'] == 'wordnet'],
+                batch_size=QUERY_CHUNK,
+                ignore_conflicts=True,
+            )
+
+    def progress(self, done, total, started):
+        elapsed = time.monotonic() - started
+        rate = done / elapsed if elapsed > 0 else 0.0
+        self.stdout.write(f"  {done}/{total} words ({rate:.1f} words/sec)")
@@ -0,0 +1,273 @@
+"""
+Request and lookup-tier metrics in the Prometheus text format (views.metrics).
+
+Each process keeps its own counters and histograms in memory; recording one
+is a dict update under a lock. Every METRICS_PUBLISH_INTERVAL seconds (and
+at exit) a background thread publishes the process's totals to a slot in
+the shared cache (settings.METRICS_CACHE_ALIAS). The metrics view adds up
+all the slots, so a scrape of any worker sees the whole deployment:
+    - a process claims a free slot with cache.add() the first time it publishes
+    - a slot not published to for METRICS_STALE_AFTER seconds belonged to a
+      process that has gone; the next process to claim it takes over its
+      totals, so counters never go backwards
+What is recorded:
+    - MetricsMiddleware: latency, SQL query count and SQL time per request,
+      labelled by URL name (the route, never the raw path)
+    - the definition tiers (core/views.py, core/jobs.py): hits, misses and
+      errors per tier, and how long each tier took
+"""
+import atexit
+import contextvars
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+COUNTER, HISTOGRAM = 'counter', 'histogram'
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Metric:
+    def __init__(self, name, kind, help, labels, buckets=None):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+
+
+METRICS = [
+    Metric('hoverlearn_requests_total', COUNTER, "Requests by URL name, method and status class.",
+           ('view', 'method', 'status')),
+    Metric('hoverlearn_request_duration_seconds', HISTOGRAM, "Time to produce the response (not to stream its body).",
+           ('view',), LATENCY_BUCKETS),
+    Metric('hoverlearn_request_db_queries', HISTOGRAM, "SQL queries run per request.",
+           ('view',), QUERY_BUCKETS),
+    Metric('hoverlearn_request_db_seconds', HISTOGRAM, "Time spent in SQL per request.",
+           ('view',), LATENCY_BUCKETS),
+    Metric('hoverlearn_definition_lookups_total', COUNTER,
+           "Definition lookups by tier (cache, database, common, negative, wordnet, gemini) and result.",
+           ('tier', 'result')),
+    Metric('hoverlearn_definition_tier_seconds', HISTOGRAM, "Time taken by a definition tier.",
+           ('tier',), LATENCY_BUCKETS),
+]
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+# The stats of the request being handled; copied into sync_to_async threads, so async views count too
+current_request = contextvars.ContextVar('current_request', default=None)
+
+
+def count_query(execute, sql, params, many, context):
+    """Execute wrapper installed on every database connection (core/signals.py)."""
+    stats = current_request.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - started
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values, extra=''):
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_number(value):
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Registry:
+    slot_prefix = 'metrics:slot'
+
+    def __init__(self, metrics, alias, interval, stale_after, max_processes):
+        self.metrics = {metric.name: metric for metric in metrics}
+        self.alias = alias
+        self.interval = interval
+        self.stale_after = stale_after
+        self.max_processes = max_processes
+        self.owner = uuid.uuid4().hex
+        self.slot = None
+        self._lock = threading.Lock()
+        # (name, label values) -> a number for counters; for histograms a list of
+        # per-bucket counts (the last one is +Inf) followed by the sum
+        self._values = {}
+        self._published = {}
+        self._publisher = None
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(labels[label] for label in self.metrics[name].labels))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        metric = self.metrics[name]
+        key = (name, tuple(labels[label] for label in metric.labels))
+        index = next((i for i, bound in enumerate(metric.buckets) if value <= bound), len(metric.buckets))
+        with self._lock:
+            values = self._values.get(key)
+            if values is None:
+                values = self._values[key] = [0] * (len(metric.buckets) + 2)
+            values[index] += 1
+            values[-1] += value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def snapshot(self):
+        with self._lock:
+            return {key: list(value) if isinstance(value, list) else value for key, value in self._values.items()}
+
+    def _slot_key(self, n):
+        return f"{self.slot_prefix}:{n}"
+
+    def _claim_slot(self):
+        now = time.time()
+        for n in range(self.max_processes):
+            entry = {'owner': self.owner, 'published': now, 'values': {}}
+            if self.shared.add(self._slot_key(n), entry, timeout=None):
+                return n
+        # All taken: take over the slot of a process that stopped publishing, and its totals
+        keys = [self._slot_key(n) for n in range(self.max_processes)]
+        for key, entry in self.shared.get_many(keys).items():
+            # The lock stops two processes from both taking over (and double counting) one slot
+            if entry['published'] < now - self.stale_after and self.shared.add(f"{key}:takeover", self.owner, 60):
+                self.shared.set(key, {'owner': self.owner, 'published': now, 'values': {}}, timeout=None)
+                with self._lock:
+                    merge(self._values, entry['values'])
+                return keys.index(key)
+        return None
+
+    def publish(self):
+        """Write this process's totals to its slot in the shared cache."""
+        if self.slot is None and not self._values:
+            # Nothing recorded (a management command, say): don't take a slot
+            return
+        if self.slot is not None:
+            entry = self.shared.get(self._slot_key(self.slot))
+            if entry is None:
+                # Evicted from the cache
+                self.slot = None
+            elif entry['owner'] != self.owner:
+                # Taken over after we stalled for longer than stale_after; its new
+                # owner has the totals we published, so only the rest is ours now
+                with self._lock:
+                    merge(self._values, self._published, sign=-1)
+                self.slot = None
+        if self.slot is None:
+            self.slot = self._claim_slot()
+            if self.slot is None:
+                logger.warning("No free metrics slot; raise METRICS_MAX_PROCESSES")
+                return
+        self._published = self.snapshot()
+        entry = {'owner': self.owner, 'published': time.time(), 'values': self._published}
+        self.shared.set(self._slot_key(self.slot), entry, timeout=None)
+
+    def publish_quietly(self):
+        try:
+            self.publish()
+        except Exception:
+            logger.exception("Could not publish metrics")
+
+    def collect(self):
+        """Totals of every process, this one's as of now."""
+        self.publish()
+        totals = {}
+        for key, entry in self.shared.get_many([self._slot_key(n) for n in range(self.max_processes)]).items():
+            merge(totals, entry['values'])
+        return totals
+
+    def render(self, values=None):
+        values = self.collect() if values is None else values
+        by_metric = {}
+        for (name, labels), value in sorted(values.items()):
+            by_metric.setdefault(name, []).append((labels, value))
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for labels, value in by_metric.get(metric.name, []):
+                if metric.kind == COUNTER:
+                    lines.append(f"{metric.name}{format_labels(metric.labels, labels)} {format_number(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip((*metric.buckets, '+Inf'), value[:-1]):
+                    cumulative += count
+                    le = f'le="{bound if bound == "+Inf" else format_number(bound)}"'
+                    lines.append(f"{metric.name}_bucket{format_labels(metric.labels, labels, le)} {cumulative}")
+                lines.append(f"{metric.name}_sum{format_labels(metric.labels, labels)} {format_number(value[-1])}")
+                lines.append(f"{metric.name}_count{format_labels(metric.labels, labels)} {cumulative}")
+        return '\n'.join(lines) + '\n'
+
+    def start_publisher(self):
+        # Started lazily (from MetricsMiddleware) so forked workers get their own
+        with self._lock:
+            if self.interval and (self._publisher is None or not self._publisher.is_alive()):
+                self._publisher = threading.Thread(target=self._run, name='metrics-publisher', daemon=True)
+                self._publisher.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.publish_quietly()
+
+
+def merge(totals, values, sign=1):
+    """Add (or with sign=-1, subtract) `values`, a snapshot, into `totals` in place."""
+    for key, value in values.items():
+        if isinstance(value, list):
+            current = totals.get(key) or [0] * len(value)
+            totals[key] = [a + sign * b for a, b in zip(current, value)]
+        else:
+            totals[key] = totals.get(key, 0) + sign * value
+
+
+metrics = Registry(
+    METRICS,
+    alias=settings.METRICS_CACHE_ALIAS,
+    interval=settings.METRICS_PUBLISH_INTERVAL,
+    stale_after=settings.METRICS_STALE_AFTER,
+    max_processes=settings.METRICS_MAX_PROCESSES,
+)
+atexit.register(metrics.publish_quietly)
+
+
+def count_lookup(tier, result, amount=1):
+    if amount:
+        metrics.inc('hoverlearn_definition_lookups_total', amount, tier=tier, result=result)
+
+
+def time_tier(tier):
+    return metrics.timer('hoverlearn_definition_tier_seconds', tier=tier)
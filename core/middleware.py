@@ -0,0 +1,57 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .metrics import RequestStats, current_request, metrics
+
+KNOWN_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+class MetricsMiddleware:
+    """
+    Records latency, SQL query count and SQL time of every request (core/metrics.py).
+    Sync and async, so async views such as get_definition stay async under ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        metrics.start_publisher()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        self.record(request, response, time.perf_counter() - started, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        self.record(request, response, time.perf_counter() - started, stats)
+        return response
+
+    def record(self, request, response, elapsed, stats):
+        # The URL name, not the path, so ids and words don't each become a time series
+        match = request.resolver_match
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        method = request.method if request.method in KNOWN_METHODS else 'other'
+        metrics.inc('hoverlearn_requests_total', view=view, method=method, status=f"{response.status_code // 100}xx")
+        metrics.observe('hoverlearn_request_duration_seconds', elapsed, view=view)
+        metrics.observe('hoverlearn_request_db_queries', stats.queries, view=view)
+        metrics.observe('hoverlearn_request_db_seconds', stats.db_seconds, view=view)
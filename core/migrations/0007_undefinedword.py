@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_videovote'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UndefinedWord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('word', models.CharField(db_index=True, max_length=100, unique=True)),
+                ('failures', models.PositiveIntegerField(default=1)),
+                ('retry_after', models.DateTimeField(db_index=True)),
+                ('saved_lookups', models.PositiveIntegerField(default=0, help_text='Slow lookups skipped thanks to this entry')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
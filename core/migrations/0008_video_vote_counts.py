@@ -0,0 +1,40 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:43
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_votes(apps, schema_editor):
+    Video = apps.get_model('core', 'Video')
+    VideoVote = apps.get_model('core', 'VideoVote')
+
+    def total(vote):
+        votes = (
+            VideoVote.objects.filter(video=OuterRef('pk'), vote=vote)
+            .order_by().values('video').annotate(n=Count('pk')).values('n')
+        )
+        return Coalesce(Subquery(votes), 0)
+
+    Video.objects.update(like_count=total('LIKE'), dislike_count=total('DISLIKE'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_undefinedword'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='dislike_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_votes, migrations.RunPython.noop),
+    ]
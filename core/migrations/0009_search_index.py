@@ -0,0 +1,46 @@
+# Full-text search tables used by core.search.FTS5Backend (SQLite only)
+
+from django.db import migrations
+
+
+def create_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE core_search_docs USING fts5("
+        "title, description, body, start UNINDEXED, tokenize='porter unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute("CREATE TABLE core_search_videos (video_id INTEGER PRIMARY KEY, cue_key TEXT NOT NULL)")
+
+
+def drop_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS core_search_docs")
+    schema_editor.execute("DROP TABLE IF EXISTS core_search_videos")
+
+
+def index_existing_videos(apps, schema_editor):
+    """Videos uploaded before the index existed; later ones are indexed as they are saved (core/signals.py)."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    # The index is derived data that `manage.py rebuild_search_index` can always redo,
+    # so this uses the live indexer rather than a frozen copy
+    from core.search import FTS5Backend
+
+    backend = FTS5Backend(using=schema_editor.connection.alias)
+    Video = apps.get_model('core', 'Video')
+    for video in Video.objects.using(schema_editor.connection.alias).order_by('id').iterator():
+        backend.index_video(video)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_video_vote_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_tables, drop_search_tables),
+        migrations.RunPython(index_existing_videos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,124 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:40
+
+import re
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, migrations, models, router
+
+
+# Frozen copy of core.text.fold() as it was when this migration was written: the live
+# word_key() also lemmatizes through cache/wordnet.sqlite3, which a machine may or may
+# not have built, and a migration must key the same rows the same way everywhere.
+# `manage.py rekey_dictionary` maps these folded keys to lemmas once the table exists.
+MARKUP_RE = re.compile(r'<[^>]*>|\{\\[^}]*\}')
+
+
+def legacy_key(word):
+    return ''.join(c for c in MARKUP_RE.sub('', word) if c.isalnum()).casefold().upper()
+
+
+def link_saved_words(apps, schema_editor):
+    """
+    Saved words had no owner: give them to settings.SAVED_WORDS_LEGACY_OWNER (a
+    username), else to the first superuser, else to the first user. Without any
+    user they are dropped. Words were saved as raw subtitle tokens ("running,"),
+    so each is keyed like DictionaryEntry.word (legacy_key); tokens that share a
+    key are kept once, and ones without a key are dropped.
+
+    The saved definitions are about to be dropped with the text columns: a word
+    the dictionary doesn't have under its key gets a DictionaryEntry from them.
+    """
+    SavedWord = apps.get_model('core', 'SavedWord')
+    DictionaryEntry = apps.get_model('core', 'DictionaryEntry')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    if not SavedWord.objects.exists():
+        return
+    if settings.SAVED_WORDS_LEGACY_OWNER:
+        owner = User.objects.filter(username=settings.SAVED_WORDS_LEGACY_OWNER).first()
+        if owner is None:
+            raise ImproperlyConfigured(
+                f"SAVED_WORDS_LEGACY_OWNER is {settings.SAVED_WORDS_LEGACY_OWNER!r}, but no user has that "
+                f"username. Create the user, or unset it to give the saved words to the first superuser."
+            )
+    else:
+        owner = User.objects.filter(is_superuser=True).order_by('id').first() or User.objects.order_by('id').first()
+    if owner is None:
+        SavedWord.objects.all().delete()
+        return
+
+    seen = {}
+    dropped = []
+    rows = list(SavedWord.objects.order_by('id'))
+    for saved in rows:
+        saved.user_id = owner.id
+        saved.word = legacy_key(saved.word)
+        if not saved.word or saved.word in seen:
+            dropped.append(saved.id)
+        else:
+            seen[saved.word] = saved
+
+    # The dictionary has its own database (core/routers.py), migrated separately
+    dictionary_db = router.db_for_write(DictionaryEntry)
+    if DictionaryEntry._meta.db_table not in connections[dictionary_db].introspection.table_names():
+        raise RuntimeError(
+            f"Saved words are being moved into the dictionary, which isn't migrated yet: "
+            f"run `python manage.py migrate --database {dictionary_db}` first."
+        )
+    known = set(DictionaryEntry.objects.filter(word__in=list(seen)).values_list('word', flat=True))
+    DictionaryEntry.objects.bulk_create(
+        [
+            DictionaryEntry(word=key, definition=saved.meaning, hindi=saved.hindi, synonyms=saved.synonyms)
+            for key, saved in seen.items() if key not in known and saved.meaning
+        ],
+        ignore_conflicts=True,
+    )
+
+    SavedWord.objects.filter(id__in=dropped).delete()
+    SavedWord.objects.bulk_update(list(seen.values()), ['user', 'word'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_enrichment_jobs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='savedword',
+            name='user',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='saved_words', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='savedword',
+            name='saved_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(link_saved_words, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='savedword',
+            name='hindi',
+        ),
+        migrations.RemoveField(
+            model_name='savedword',
+            name='meaning',
+        ),
+        migrations.RemoveField(
+            model_name='savedword',
+            name='synonyms',
+        ),
+        migrations.AlterField(
+            model_name='savedword',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saved_words', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='savedword',
+            unique_together={('user', 'word')},
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_saved_word_links'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='videonote',
+            index=models.Index(fields=['user', 'video', 'timestamp'], name='core_videon_user_id_0ce9b2_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 class Video(models.Model):
     title = models.CharField(max_length=200)
@@ -7,18 +8,54 @@ class Video(models.Model):
     video_file = models.FileField(upload_to='videos/')
     subtitle_file = models.FileField(upload_to='subs/') 
     thumbnail = models.ImageField(upload_to='thumbs/', blank=True, null=True)
+    # Denormalized VideoVote totals, kept in step by handle_vote (`manage.py recount_votes` repairs them)
+    like_count = models.PositiveIntegerField(default=0)
+    dislike_count = models.PositiveIntegerField(default=0)
+    # WebP copies of `thumbnail` (core/thumbnails.py): {'source': name, 'variants': [[width, name], ...]}
+    thumbnail_variants = models.JSONField(default=dict, blank=True, editable=False)
+
+    def current_thumbnail_variants(self):
+        """[[width, name], ...] made from the current thumbnail; [] until they are rendered."""
+        if self.thumbnail and self.thumbnail_variants.get('source') == self.thumbnail.name:
+            return self.thumbnail_variants['variants']
+        return []
+
+    @property
+    def thumbnail_srcset(self):
+        storage = self.thumbnail.storage
+        return ', '.join(f"{storage.url(name)} {width}w" for width, name in self.current_thumbnail_variants())
+
+    @property
+    def thumbnail_src(self):
+        """The narrowest variant that fills a grid card, else the original."""
+        for width, name in self.current_thumbnail_variants():
+            if width >= settings.THUMBNAIL_CARD_WIDTH:
+                return self.thumbnail.storage.url(name)
+        return self.thumbnail.url if self.thumbnail else ''
+
+    @property
+    def thumbnail_hero_url(self):
+        """The widest variant, for the home page banner."""
+        variants = self.current_thumbnail_variants()
+        if variants:
+            return self.thumbnail.storage.url(variants[-1][1])
+        return self.thumbnail.url if self.thumbnail else ''
 
     def __str__(self):
         return self.title
 
 class SavedWord(models.Model):
+    """A word on a user's "My List": a link to the shared DictionaryEntry, not a copy of its text."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='saved_words')
+    # The DictionaryEntry.word key. Not a ForeignKey: the dictionary has its own database (core/routers.py)
     word = models.CharField(max_length=100)
-    meaning = models.TextField()
-    hindi = models.CharField(max_length=255, blank=True, null=True)
-    synonyms = models.TextField(blank=True, null=True)
-    
+    saved_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'word')
+
     def __str__(self):
-        return self.word
+        return f"{self.user} - {self.word}"
 
 class DictionaryEntry(models.Model):
     """
@@ -29,13 +66,72 @@ class DictionaryEntry(models.Model):
     definition = models.TextField()
     hindi = models.CharField(max_length=255, blank=True, null=True)
     synonyms = models.TextField(blank=True, null=True) # Stored as "happy, joy, glee"
+    SOURCE_CHOICES = (
+        ('common', 'Common words list'),
+        ('wordnet', 'WordNet'),
+        ('gemini', 'Gemini'),
+    )
+    # WordNet entries are replaced by Gemini's in the background (core/jobs.py)
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES, default='gemini')
     
     created_at = models.DateTimeField(auto_now_add=True)
 
+    def as_word_data(self):
+        """The dict shape afetch_word_data returns."""
+        return {
+            'definition': self.definition,
+            'hindi': self.hindi,
+            'synonyms': self.synonyms.split(',') if self.synonyms else [],
+            'found': True,
+            'source': self.source,
+        }
+
     def __str__(self):
         return self.word
 
 
+class UndefinedWord(models.Model):
+    """
+    Negative cache: words no lookup tier could define (names, slang, subtitle junk).
+    Until retry_after passes they answer "Definition not available." without
+    calling Gemini or WordNet; each failed retry pushes retry_after further out.
+    """
+    word = models.CharField(max_length=100, unique=True, db_index=True)
+    failures = models.PositiveIntegerField(default=1)
+    retry_after = models.DateTimeField(db_index=True)
+    saved_lookups = models.PositiveIntegerField(default=0, help_text='Slow lookups skipped thanks to this entry')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.word
+
+
+class EnrichmentJob(models.Model):
+    """A word whose card was answered locally and still needs its Gemini definition (see core/jobs.py)."""
+    STATUS_CHOICES = (
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    )
+    word = models.CharField(max_length=100, unique=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_after'])]
+
+    def __str__(self):
+        return f"{self.word} ({self.status})"
+
+
 class VideoNote(models.Model):
     """Notes a user takes tied to a specific video and optional timestamp."""
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='video_notes')
@@ -46,6 +142,8 @@ class VideoNote(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        # The player's timeline markers ask for one user's notes on a video by time range (views.video_notes)
+        indexes = [models.Index(fields=['user', 'video', 'timestamp'])]
 
     def formatted_timestamp(self):
         """Return timestamp as M:SS or None if no timestamp."""
@@ -0,0 +1,108 @@
+"""
+Keyset pagination for the home grid and "My List".
+
+home() used to render every Video in one page; now it renders the first
+HOME_PAGE_SIZE and the grid asks video_page for more as it is scrolled.
+saved_list() does the same with SAVED_WORDS_PAGE_SIZE of the user's words,
+and the player's notes pane with NOTES_PAGE_SIZE of the user's notes on a video.
+Pages are cut by the last item shown rather than by OFFSET, so each page is
+one index range scan no matter how deep the reader has scrolled:
+    browsing   newest first: `id < last id` ORDER BY id DESC (the primary key)
+    searching  backend order: (score, video id) of the last result, passed to
+               the search backend's `after` (core/search.py)
+    saved      newest first: `user = me AND id < last id`, on the user index
+    notes      newest first: `user = me AND video = v AND id < last id`
+The cursor handed to the client is that key, JSON in urlsafe base64.
+"""
+import base64
+import json
+from collections import namedtuple
+
+from .models import DictionaryEntry, SavedWord, Video, VideoNote
+
+Page = namedtuple('Page', ['videos', 'next_cursor'])
+WordPage = namedtuple('WordPage', ['words', 'next_cursor'])
+NotePage = namedtuple('NotePage', ['notes', 'next_cursor'])
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, length):
+    """The key list encoded in `cursor`, which must hold `length` numbers."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError as e:
+        raise InvalidCursor(cursor) from e
+    if (not isinstance(key, list) or len(key) != length
+            or not all(isinstance(k, (int, float)) and not isinstance(k, bool) for k in key)):
+        raise InvalidCursor(cursor)
+    return key
+
+
+def video_page(cursor, size):
+    """Newest videos first, after `cursor`."""
+    videos = Video.objects.order_by('-id')
+    if cursor:
+        last_id, = decode_cursor(cursor, 1)
+        videos = videos.filter(id__lt=last_id)
+    # One extra row says whether there is a next page
+    videos = list(videos[:size + 1])
+    if len(videos) <= size:
+        return Page(videos, None)
+    videos = videos[:size]
+    return Page(videos, encode_cursor([videos[-1].id]))
+
+
+def search_page(backend, q, cursor, size):
+    """Search results for `q` in rank order, after `cursor`; each video carries .search_matches."""
+    after = decode_cursor(cursor, 2) if cursor else None
+    results = backend.search(q, limit=size + 1, after=after)
+    more = len(results) > size
+    results = results[:size]
+
+    by_id = Video.objects.in_bulk([r.video_id for r in results])
+    videos = []
+    for result in results:
+        video = by_id.get(result.video_id)
+        if video is not None:
+            video.search_matches = result.matches
+            videos.append(video)
+    # The key comes from the results, so a video deleted meanwhile doesn't stall paging
+    next_cursor = encode_cursor([results[-1].score, results[-1].video_id]) if more else None
+    return Page(videos, next_cursor)
+
+
+def saved_word_page(user, cursor, size):
+    """`user`'s saved words, newest first, after `cursor`; each carries .entry, its DictionaryEntry or None."""
+    saved = SavedWord.objects.filter(user=user).order_by('-id')
+    if cursor:
+        last_id, = decode_cursor(cursor, 1)
+        saved = saved.filter(id__lt=last_id)
+    saved = list(saved[:size + 1])
+    more = len(saved) > size
+    saved = saved[:size]
+
+    # The page's definitions in one query; not a JOIN, the dictionary has its own database (core/routers.py)
+    entries = DictionaryEntry.objects.in_bulk([s.word for s in saved], field_name='word')
+    for s in saved:
+        s.entry = entries.get(s.word)
+    return WordPage(saved, encode_cursor([saved[-1].id]) if more else None)
+
+
+def note_page(user, video, cursor, size):
+    """`user`'s notes on `video`, newest first, after `cursor`."""
+    notes = VideoNote.objects.filter(user=user, video=video).order_by('-id')
+    if cursor:
+        last_id, = decode_cursor(cursor, 1)
+        notes = notes.filter(id__lt=last_id)
+    notes = list(notes[:size + 1])
+    if len(notes) <= size:
+        return NotePage(notes, None)
+    notes = notes[:size]
+    return NotePage(notes, encode_cursor([notes[-1].id]))
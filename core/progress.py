@@ -0,0 +1,138 @@
+"""
+Write-coalescing buffer for watch progress.
+
+Every open player POSTs its position to update_history every 5 seconds, and
+each POST used to be a SELECT plus an UPDATE through SQLite's single writer
+lock. ProgressBuffer keeps only the latest position per (user, video):
+    - record() keeps it in this process, with the time it was recorded, until
+      it is flushed, and puts it in the shared cache
+      (settings.PROGRESS_CACHE_ALIAS) so every worker reads the newest value
+    - flush() upserts this process's pending positions into WatchHistory in
+      one statement; a background thread runs it every
+      settings.PROGRESS_FLUSH_INTERVAL seconds, and it also runs at exit and
+      when the player's unload beacon asks for it. A row is only overwritten
+      by a position recorded after it was written, so a worker flushing late
+      can't move a viewer back to where another worker's newer update left
+    - position() reads through the buffer, so resuming is never behind
+The shared cache is only for reading: it may cull or expire an entry, so
+what is written comes from the process's own copy. A worker killed without
+running its exit handlers loses at most one interval.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from .models import Video, WatchHistory
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressBuffer:
+    key_prefix = 'progress'
+
+    def __init__(self, alias, interval, timeout):
+        self.alias = alias
+        self.interval = interval
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        # (user_id, video_id) -> (latest position recorded here since the last flush, when it was recorded)
+        self._dirty = {}
+        self._flusher = None
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def _key(self, user_id, video_id):
+        return f"{self.key_prefix}:{user_id}:{video_id}"
+
+    def record(self, user_id, video_id, position):
+        with self._lock:
+            self._dirty[user_id, video_id] = (position, timezone.now())
+            self._ensure_flusher()
+        self.shared.set(self._key(user_id, video_id), position, timeout=self.timeout)
+
+    def position(self, user_id, video_id):
+        """Latest known position: the buffered one if any, else WatchHistory, else None."""
+        position = self.shared.get(self._key(user_id, video_id))
+        if position is None:
+            with self._lock:
+                position, _ = self._dirty.get((user_id, video_id), (None, None))
+        if position is not None:
+            return position
+        return (
+            WatchHistory.objects.filter(user_id=user_id, video_id=video_id)
+            .values_list('last_position', flat=True).first()
+        )
+
+    def flush(self):
+        """Write every position recorded by this process since the last flush; returns the rows written."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        if not dirty:
+            return 0
+
+        # Videos or users deleted since the update was recorded would break the foreign keys
+        video_ids = set(Video.objects.filter(id__in={v for _, v in dirty}).values_list('id', flat=True))
+        user_ids = set(get_user_model().objects.filter(id__in={u for u, _ in dirty}).values_list('id', flat=True))
+        adapt = connection.ops.adapt_datetimefield_value
+        rows = [
+            (user_id, video_id, position, adapt(recorded_at))
+            for (user_id, video_id), (position, recorded_at) in dirty.items()
+            if user_id in user_ids and video_id in video_ids
+        ]
+        if not rows:
+            return 0
+        # bulk_create(update_conflicts=True) can't make the update conditional, and would stamp
+        # updated_at with the flush time instead of when the position was recorded
+        table = WatchHistory._meta.db_table
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(
+                    f"INSERT INTO {table} (user_id, video_id, last_position, updated_at) VALUES (%s, %s, %s, %s) "
+                    f"ON CONFLICT (user_id, video_id) DO UPDATE "
+                    f"SET last_position = excluded.last_position, updated_at = excluded.updated_at "
+                    f"WHERE excluded.updated_at > {table}.updated_at",
+                    rows,
+                )
+                written = cursor.rowcount
+        except DatabaseError:
+            # Keep them for the next flush; newer positions recorded meanwhile win anyway
+            with self._lock:
+                self._dirty = {**dirty, **self._dirty}
+            raise
+        return written
+
+    def flush_quietly(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Could not flush watch progress")
+
+    def _ensure_flusher(self):
+        # Called with self._lock held; started lazily so forked workers get their own
+        if self.interval and (self._flusher is None or not self._flusher.is_alive()):
+            self._flusher = threading.Thread(target=self._run, name='progress-flusher', daemon=True)
+            self._flusher.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush_quietly()
+            # Don't hold a database connection open between flushes
+            connection.close()
+
+
+progress_buffer = ProgressBuffer(
+    alias=settings.PROGRESS_CACHE_ALIAS,
+    interval=settings.PROGRESS_FLUSH_INTERVAL,
+    timeout=settings.PROGRESS_BUFFER_TIMEOUT,
+)
+atexit.register(progress_buffer.flush_quietly)
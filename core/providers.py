@@ -0,0 +1,118 @@
+"""
+Lazily created lookup backends.
+
+Importing google.generativeai, configuring Gemini, loading WordNet and
+reading common_words.json used to happen when core.views was imported,
+i.e. before a worker could serve even the login page. Each backend is now
+built by a registered factory the first time `get(name)` asks for it.
+Deployments that prefer a warm start list the names in
+settings.HOVERLEARN_PRELOAD and they are built when the app loads.
+"""
+import json
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+_factories = {}
+_instances = {}
+_lock = threading.RLock()
+
+
+def register(name):
+    """Decorator registering `factory()` as the builder of backend `name`."""
+    def decorator(factory):
+        _factories[name] = factory
+        return factory
+    return decorator
+
+
+def get(name):
+    try:
+        return _instances[name]
+    except KeyError:
+        pass
+    with _lock:
+        if name not in _instances:
+            _instances[name] = _factories[name]()
+        return _instances[name]
+
+
+def is_loaded(name):
+    return name in _instances
+
+
+def preload(names=None):
+    """Build the given backends (default: all of them) now instead of on first use."""
+    for name in (names if names is not None else list(_factories)):
+        try:
+            get(name)
+        except Exception as e:
+            logger.warning("Could not preload %s: %s", name, e)
+
+
+def reset(name=None):
+    """Forget built backends so the next get() rebuilds them."""
+    with _lock:
+        if name is None:
+            _instances.clear()
+        else:
+            _instances.pop(name, None)
+
+
+# --- BACKENDS ---
+
+@register('gemini_model')
+def _gemini_model():
+    if not settings.GEMINI_API_KEY:
+        raise ImproperlyConfigured("GEMINI_API_KEY is not set; set it in the environment to use Gemini.")
+    import google.generativeai as genai
+    genai.configure(api_key=settings.GEMINI_API_KEY)
+    return genai.GenerativeModel(settings.GEMINI_MODEL)
+
+
+@register('gemini')
+def _gemini():
+    from .gemini import GeminiBatcher
+    return GeminiBatcher(
+        get('gemini_model'),
+        batch_size=settings.GEMINI_BATCH_SIZE,
+        max_wait=settings.GEMINI_BATCH_MAX_WAIT,
+        timeout=settings.GEMINI_TIMEOUT,
+    )
+
+
+def common_words_path():
+    return os.path.join(settings.BASE_DIR, 'core', 'common_words.json')
+
+
+@register('common_dict')
+def _common_dict():
+    try:
+        with open(common_words_path(), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+@register('wordnet')
+def _wordnet():
+    # The prebuilt table, not the NLTK corpus (see core/wordnet_table.py)
+    from .wordnet_table import WordNetTable
+    return WordNetTable(settings.WORDNET_TABLE_PATH)
+
+
+@register('search')
+def _search():
+    from django.db import connection
+    from django.utils.module_loading import import_string
+    from .search import FTS5Backend, SimpleBackend
+    backend = import_string(settings.SEARCH_BACKEND)
+    if backend is FTS5Backend and connection.vendor != 'sqlite':
+        logger.warning("FTS5 search needs SQLite; falling back to SimpleBackend")
+        return SimpleBackend()
+    return backend()
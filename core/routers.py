@@ -0,0 +1,55 @@
+"""
+Keeps the dictionary in its own database (settings.DATABASES['dictionary']).
+
+Hover lookups read DictionaryEntry (and UndefinedWord, EnrichmentJob) far
+more often than anything else, and used to queue behind the sessions,
+WatchHistory, VideoNote and VideoVote writes sharing db.sqlite3. With this
+router those three models live in dictionary.sqlite3:
+    - reads go to 'dictionary_read': the same file opened with
+      PRAGMA query_only, in WAL mode so readers never wait for the writer
+    - writes go to 'dictionary', the one writer connection per process,
+      whose IMMEDIATE transactions take the write lock up front instead of
+      failing to upgrade a read lock halfway through
+    - inside a transaction on the writer, reads stay on it so they see
+      its uncommitted writes (this also keeps tests' transactions working)
+Without a 'dictionary' database configured everything stays in 'default'.
+"""
+from django.conf import settings
+from django.db import connections
+
+WRITE_ALIAS = 'dictionary'
+READ_ALIAS = 'dictionary_read'
+DICTIONARY_MODELS = {'dictionaryentry', 'undefinedword', 'enrichmentjob'}
+
+
+def is_dictionary_model(app_label, model_name):
+    return app_label == 'core' and model_name in DICTIONARY_MODELS
+
+
+class DictionaryRouter:
+    def __init__(self):
+        self.write_alias = WRITE_ALIAS if WRITE_ALIAS in settings.DATABASES else None
+        self.read_alias = READ_ALIAS if READ_ALIAS in settings.DATABASES else self.write_alias
+
+    def _routed(self, model):
+        return self.write_alias and is_dictionary_model(model._meta.app_label, model._meta.model_name)
+
+    def db_for_read(self, model, **hints):
+        if not self._routed(model):
+            return None
+        if connections[self.write_alias].in_atomic_block:
+            return self.write_alias
+        return self.read_alias
+
+    def db_for_write(self, model, **hints):
+        return self.write_alias if self._routed(model) else None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if not self.write_alias:
+            return None
+        if db == self.read_alias and db != self.write_alias:
+            return False
+        if model_name is not None and is_dictionary_model(app_label, model_name):
+            return db == self.write_alias
+        # Everything else, including migrations that run SQL or Python without a model, stays out
+        return False if db == self.write_alias else None
@@ -0,0 +1,215 @@
+"""
+Video search over titles, descriptions and subtitle transcripts.
+
+home() used to filter `title__icontains`: a LIKE scan that could only match
+titles. Searches now go to the backend named by settings.SEARCH_BACKEND
+(built on first use, see core/providers.py):
+
+    FTS5Backend    SQLite FTS5 table in the default database (migration 0009):
+                   one row per video (title, description) and one per subtitle
+                   cue, ranked with bm25, so cue hits carry their start time
+    SimpleBackend  the old icontains filter on title/description, for
+                   databases without FTS5
+
+Rows for video N use rowids N << CUE_BITS onwards (0 = title/description,
+then one per cue), so a video's rows are replaced with a rowid range delete.
+The index follows Video saves and deletes (core/signals.py); cues are only
+re-indexed when the subtitle file's cue index key changes.
+`manage.py rebuild_search_index` rebuilds it from scratch.
+"""
+import re
+from collections import Counter, namedtuple
+
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Video
+from .subtitles import cue_index_for_video
+
+DOCS_TABLE = 'core_search_docs'
+STATE_TABLE = 'core_search_videos'
+
+# Low bits of a row's rowid: 0 for the title/description row, i + 1 for cue i
+CUE_BITS = 20
+MAX_CUES = (1 << CUE_BITS) - 1
+
+# bm25 column weights: title, description, transcript
+RANK_WEIGHTS = (10.0, 4.0, 1.0)
+MAX_MATCHES_PER_VIDEO = 5
+SNIPPET_TOKENS = 12
+
+QUERY_TOKEN_RE = re.compile(r'\w+')
+
+SearchResult = namedtuple('SearchResult', ['video_id', 'score', 'matches'])
+
+
+class CueMatch(namedtuple('CueMatch', ['start', 'snippet'])):
+    __slots__ = ()
+
+    @property
+    def formatted_start(self):
+        """Start as M:SS, like VideoNote.formatted_timestamp."""
+        total = int(self.start)
+        return f"{total // 60}:{total % 60:02d}"
+
+
+def fts_query(q, operator='AND'):
+    """User input as an FTS5 query: every word (or any, with operator='OR'); the last one may be a prefix."""
+    terms = [f'"{t}"' for t in QUERY_TOKEN_RE.findall(q.lower())]
+    if not terms:
+        return ''
+    terms[-1] += '*'
+    return f' {operator} '.join(terms)
+
+
+def _highlight(snippet):
+    # FTS5 marks matches with \x02/\x03 so the text can be escaped before adding <mark>
+    return mark_safe(escape(snippet).replace('\x02', '<mark>').replace('\x03', '</mark>'))
+
+
+class FTS5Backend:
+    def __init__(self, using='default'):
+        self.using = using
+
+    def _cursor(self):
+        return connections[self.using].cursor()
+
+    def index(self, video_id, title, description, cues, cue_key, force=False):
+        """
+        (Re)index one video. `cues` is an iterable of (start, text); it is only
+        consumed when `cue_key` differs from what was indexed last, or `force`.
+        """
+        base = video_id << CUE_BITS
+        with transaction.atomic(using=self.using), self._cursor() as cursor:
+            cursor.execute(f"SELECT cue_key FROM {STATE_TABLE} WHERE video_id = %s", [video_id])
+            row = cursor.fetchone()
+            reindex_cues = force or row is None or row[0] != cue_key
+            if reindex_cues:
+                cursor.execute(f"DELETE FROM {DOCS_TABLE} WHERE rowid BETWEEN %s AND %s", [base, base + MAX_CUES])
+            else:
+                cursor.execute(f"DELETE FROM {DOCS_TABLE} WHERE rowid = %s", [base])
+
+            rows = [(base, title, description or '', '', None)]
+            if reindex_cues:
+                for i, (start, text) in enumerate(cues):
+                    if i >= MAX_CUES:
+                        break
+                    rows.append((base + i + 1, '', '', text, start))
+            cursor.executemany(
+                f"INSERT INTO {DOCS_TABLE} (rowid, title, description, body, start) VALUES (%s, %s, %s, %s, %s)",
+                rows,
+            )
+            cursor.execute(
+                f"INSERT INTO {STATE_TABLE} (video_id, cue_key) VALUES (%s, %s) "
+                f"ON CONFLICT (video_id) DO UPDATE SET cue_key = excluded.cue_key",
+                [video_id, cue_key],
+            )
+
+    def index_video(self, video, force=False):
+        cue_index = cue_index_for_video(video)
+        cues = ((start, ' '.join(words)) for start, words in zip(cue_index.starts, cue_index.words))
+        self.index(video.id, video.title, video.description, cues, cue_index.key, force=force)
+
+    def remove_video(self, video_id):
+        base = video_id << CUE_BITS
+        with transaction.atomic(using=self.using), self._cursor() as cursor:
+            cursor.execute(f"DELETE FROM {DOCS_TABLE} WHERE rowid BETWEEN %s AND %s", [base, base + MAX_CUES])
+            cursor.execute(f"DELETE FROM {STATE_TABLE} WHERE video_id = %s", [video_id])
+
+    def clear(self):
+        with transaction.atomic(using=self.using), self._cursor() as cursor:
+            cursor.execute(f"DELETE FROM {DOCS_TABLE}")
+            cursor.execute(f"DELETE FROM {STATE_TABLE}")
+
+    def search(self, q, limit=20, after=None):
+        """
+        Ranked SearchResults, best first, each with up to MAX_MATCHES_PER_VIDEO cue matches.
+        Rows (a cue, or a video's title/description) must contain every word; if
+        none does, rows containing any of them are ranked instead. `after` is the
+        (score, video_id) of the last result of the previous page (keyset paging).
+        """
+        query = fts_query(q)
+        if not query:
+            return []
+        if len(QUERY_TOKEN_RE.findall(q)) > 1 and not self._matches_anything(query):
+            query = fts_query(q, 'OR')
+        return self._search(query, limit, after)
+
+    def _matches_anything(self, query):
+        with self._cursor() as cursor:
+            cursor.execute(f"SELECT 1 FROM {DOCS_TABLE} WHERE {DOCS_TABLE} MATCH %s LIMIT 1", [query])
+            return cursor.fetchone() is not None
+
+    def _search(self, query, limit, after):
+        weights = ', '.join(str(w) for w in RANK_WEIGHTS)
+        rank = f"bm25({DOCS_TABLE}, {weights})"
+        # bm25 is lower-is-better; results are ordered by it, then by video id
+        page_filter, params = '', [query]
+        if after is not None:
+            page_filter = "HAVING (MIN(rank), video_id) > (%s, %s)"
+            params += [-after[0], after[1]]
+        with self._cursor() as cursor:
+            # MATERIALIZED: bm25() can't run once SQLite flattens it into the GROUP BY
+            cursor.execute(
+                f"WITH hits AS MATERIALIZED ("
+                f"  SELECT rowid >> {CUE_BITS} AS video_id, {rank} AS rank"
+                f"  FROM {DOCS_TABLE} WHERE {DOCS_TABLE} MATCH %s"
+                f") SELECT video_id, MIN(rank) FROM hits"
+                f" GROUP BY video_id {page_filter} ORDER BY MIN(rank), video_id LIMIT %s",
+                params + [limit],
+            )
+            results = {video_id: SearchResult(video_id, -score, []) for video_id, score in cursor.fetchall()}
+            if not results:
+                return []
+
+            # Best cues of the videos on this page; snippets only for the ones shown
+            placeholders = ', '.join(['%s'] * len(results))
+            cursor.execute(
+                f"SELECT rowid, start FROM {DOCS_TABLE} "
+                f"WHERE {DOCS_TABLE} MATCH %s AND (rowid >> {CUE_BITS}) IN ({placeholders}) AND start IS NOT NULL "
+                f"ORDER BY {rank}",
+                [query, *results],
+            )
+            shown = {}          # rowid -> (video_id, start) of the cues to show
+            shown_per_video = Counter()
+            for rowid, start in cursor.fetchall():
+                video_id = rowid >> CUE_BITS
+                if shown_per_video[video_id] < MAX_MATCHES_PER_VIDEO:
+                    shown[rowid] = (video_id, start)
+                    shown_per_video[video_id] += 1
+
+            if shown:
+                placeholders = ', '.join(['%s'] * len(shown))
+                cursor.execute(
+                    f"SELECT rowid, snippet({DOCS_TABLE}, 2, char(2), char(3), '…', {SNIPPET_TOKENS}) "
+                    f"FROM {DOCS_TABLE} WHERE {DOCS_TABLE} MATCH %s AND rowid IN ({placeholders})",
+                    [query, *shown],
+                )
+                for rowid, snippet in cursor.fetchall():
+                    video_id, start = shown[rowid]
+                    results[video_id].matches.append(CueMatch(start, _highlight(snippet)))
+
+        for result in results.values():
+            result.matches.sort()
+        return list(results.values())
+
+
+class SimpleBackend:
+    """icontains on title/description; no transcripts, ranking or timestamps."""
+
+    def index_video(self, video, force=False):
+        pass
+
+    def remove_video(self, video_id):
+        pass
+
+    def clear(self):
+        pass
+
+    def search(self, q, limit=20, after=None):
+        videos = Video.objects.filter(Q(title__icontains=q) | Q(description__icontains=q)).order_by('id')
+        if after is not None:
+            videos = videos.filter(id__gt=after[1])
+        return [SearchResult(video_id, 0.0, []) for video_id in videos.values_list('id', flat=True)[:limit]]
@@ -0,0 +1,57 @@
+import logging
+
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import providers, thumbnails
+from .cache import definition_cache
+from .metrics import count_query
+from .models import DictionaryEntry, Video
+
+logger = logging.getLogger(__name__)
+
+
+# Count the queries and SQL time of each request (core/metrics.py)
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    # connection_created fires again on reconnect; the wrapper list survives it
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+# Keep the shared definition cache in step with the dictionary table
+@receiver(post_save, sender=DictionaryEntry)
+def cache_dictionary_entry(sender, instance, **kwargs):
+    definition_cache.set(instance.word, instance.as_word_data())
+
+
+@receiver(post_delete, sender=DictionaryEntry)
+def uncache_dictionary_entry(sender, instance, **kwargs):
+    definition_cache.delete(instance.word)
+
+
+# Keep the search index in step with the video library (cues only when the subtitle file changed)
+@receiver(post_save, sender=Video)
+def index_video(sender, instance, **kwargs):
+    try:
+        providers.get('search').index_video(instance)
+    except Exception:
+        logger.exception("Could not index video %s for search", instance.pk)
+
+
+@receiver(post_delete, sender=Video)
+def unindex_video(sender, instance, **kwargs):
+    try:
+        providers.get('search').remove_video(instance.pk)
+    except Exception:
+        logger.exception("Could not remove video %s from the search index", instance.pk)
+
+
+# Render the WebP thumbnail variants at upload (only when the thumbnail changed)
+@receiver(post_save, sender=Video)
+def render_thumbnail_variants(sender, instance, **kwargs):
+    try:
+        thumbnails.update_video(instance)
+    except Exception:
+        logger.exception("Could not render thumbnail variants for video %s", instance.pk)
@@ -0,0 +1,208 @@
+"""
+HTTP Range support for media files (views.stream_media).
+
+django.views.static.serve, which hoverlearn/urls.py used for /media/, always
+answers 200 with the whole file. A <video> that seeks, or resumes from
+WatchHistory.last_position, therefore had to wait for everything before
+that point to be read through Python. serve_file() answers:
+
+    Range: bytes=a-b           206 with that slice
+    Range: bytes=a-b,c-d,...   206 multipart/byteranges
+    If-Range: <etag or date>   the range only if the file is unchanged, else 200
+    If-None-Match / If-Modified-Since
+                               304, via django's get_conditional_response
+    a range outside the file   416 with Content-Range: bytes */<size>
+
+Whole files and single ranges are FileResponses over the open file. Under a
+server with wsgi.file_wrapper (gunicorn, uWSGI) they are sent with
+os.sendfile, starting at the range's offset and stopping at Content-Length,
+so no bytes pass through Python. RangeFile bounds read() for servers without
+it. Multipart responses are generated in Python; players rarely ask for them.
+"""
+import mimetypes
+import os
+import re
+import secrets
+
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+# Larger than FileResponse's 4 KiB: fewer reads when Python has to copy
+STREAM_BLOCK_SIZE = 64 * 1024
+# More ranges than this (after merging overlaps) are answered with the whole file
+MAX_RANGES = 16
+
+RANGE_SPEC_RE = re.compile(r'^\s*(\d*)\s*-\s*(\d*)\s*$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    The byte ranges of a Range header as sorted, merged [(first, last), ...]
+    (inclusive), or None when the header should be ignored (malformed, not
+    bytes, or too many ranges). Raises RangeNotSatisfiable when no range
+    overlaps the file.
+    """
+    unit, _, specs = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not specs:
+        return None
+    ranges = []
+    for spec in specs.split(','):
+        match = RANGE_SPEC_RE.match(spec)
+        if not match or match.groups() == ('', ''):
+            return None
+        first, last = match.groups()
+        if first == '':
+            # Suffix range: the last N bytes
+            suffix = int(last)
+            if suffix == 0 or size == 0:
+                continue
+            first, last = max(size - suffix, 0), size - 1
+        else:
+            first, last = int(first), int(last) if last else None
+            if last is not None and last < first:
+                return None
+            if first >= size:
+                continue
+            last = size - 1 if last is None else min(last, size - 1)
+        ranges.append((first, last))
+    if not ranges:
+        raise RangeNotSatisfiable(header)
+
+    merged = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged if len(merged) <= MAX_RANGES else None
+
+
+class RangeFile:
+    """Read-only view of `length` bytes of an open file from `offset`; fileno()/tell() allow sendfile."""
+
+    def __init__(self, file, offset, length):
+        self.file = file
+        self.remaining = length
+        file.seek(offset)
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def file_etag(stat):
+    return quote_etag(f"{stat.st_mtime_ns:x}-{stat.st_size:x}")
+
+
+def if_range_matches(request, etag, last_modified):
+    """Whether a Range request may be honoured (RFC 9110 13.1.5); always when there is no If-Range."""
+    value = request.META.get('HTTP_IF_RANGE')
+    if not value:
+        return True
+    value = value.strip()
+    if value.startswith('"'):
+        return value == etag
+    # A date only validates if it is exactly the file's modification time
+    return parse_http_date_safe(value) == int(last_modified)
+
+
+def serve_file(request, fullpath, cache_control=None):
+    """Response for GET/HEAD of the file at `fullpath`, honouring Range and conditional headers."""
+    stat = os.stat(fullpath)
+    etag = file_etag(stat)
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        response = ranged_response(request, fullpath, stat, etag)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    if cache_control:
+        response['Cache-Control'] = cache_control
+    return response
+
+
+def ranged_response(request, fullpath, stat, etag):
+    size = stat.st_size
+    content_type = mimetypes.guess_type(fullpath)[0] or 'application/octet-stream'
+    ranges = None
+    header = request.META.get('HTTP_RANGE')
+    if header and if_range_matches(request, etag, stat.st_mtime):
+        try:
+            ranges = parse_range(header, size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    file = open(fullpath, 'rb')
+    if ranges is None:
+        response = FileResponse(file, content_type=content_type)
+    elif len(ranges) == 1:
+        first, last = ranges[0]
+        response = FileResponse(RangeFile(file, first, last - first + 1), status=206, content_type=content_type)
+        response['Content-Length'] = last - first + 1
+        response['Content-Range'] = f'bytes {first}-{last}/{size}'
+    else:
+        response = multipart_response(file, ranges, size, content_type)
+    response.block_size = STREAM_BLOCK_SIZE
+    return response
+
+
+def multipart_response(file, ranges, size, content_type):
+    boundary = secrets.token_hex(16)
+    headers = [
+        (
+            f'--{boundary}\r\nContent-Type: {content_type}\r\n'
+            f'Content-Range: bytes {first}-{last}/{size}\r\n\r\n'
+        ).encode()
+        for first, last in ranges
+    ]
+    closing = f'\r\n--{boundary}--\r\n'.encode()
+    length = sum(len(h) for h in headers) + sum(last - first + 1 for first, last in ranges)
+    # Every part but the first is preceded by a CRLF
+    length += 2 * (len(ranges) - 1) + len(closing)
+
+    response = StreamingHttpResponse(
+        MultipartBody(file, ranges, headers, closing), status=206,
+        content_type=f'multipart/byteranges; boundary={boundary}',
+    )
+    response['Content-Length'] = length
+    return response
+
+
+class MultipartBody:
+    """The parts of a multipart/byteranges body; close() (called with the response's) closes the file."""
+
+    def __init__(self, file, ranges, headers, closing):
+        self.file = file
+        self.ranges = ranges
+        self.headers = headers
+        self.closing = closing
+
+    def __iter__(self):
+        for i, (head, (first, last)) in enumerate(zip(self.headers, self.ranges)):
+            yield (b'\r\n' if i else b'') + head
+            part = RangeFile(self.file, first, last - first + 1)
+            while chunk := part.read(STREAM_BLOCK_SIZE):
+                yield chunk
+        yield self.closing
+
+    def close(self):
+        self.file.close()
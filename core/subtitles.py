@@ -0,0 +1,222 @@
+"""
+Fast SRT parsing and a persisted cue index for Video.subtitle_file.
+
+Parsing an SRT with pysrt on every page view is wasteful: the file rarely
+changes, so we parse it once into a compact CueIndex (sorted start/end
+arrays plus the tokenized words of every cue and their dictionary keys,
+see core/text.py) and keep it:
+    1. in-process, in a small LRU keyed by the file's path + mtime + size
+    2. on disk, as JSON under settings.CUE_INDEX_DIR, so new workers start warm
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .text import normalizer_version, strip_markup, word_key
+
+# Bump when the on-disk format or tokenization changes so old files are ignored.
+INDEX_VERSION = 2
+
+TIMING_RE = re.compile(
+    r'(\d+):(\d{1,2}):(\d{1,2})[,.](\d{1,3})\s*-->\s*'
+    r'(\d+):(\d{1,2}):(\d{1,2})[,.](\d{1,3})'
+)
+BLOCK_SPLIT_RE = re.compile(r'\n[ \t]*\n')
+
+_memory_cache = OrderedDict()
+_memory_lock = threading.Lock()
+
+
+def _to_seconds(hours, minutes, seconds, millis):
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds) + int(millis.ljust(3, '0')) / 1000.0
+
+
+def decode(raw):
+    for encoding in ('utf-8-sig', 'cp1252'):
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return raw.decode('latin-1')
+
+
+def parse_srt(text, keep_markup=False):
+    """Return a list of (start, end, words) tuples sorted by start time; markup is stripped unless asked."""
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    cues = []
+    for block in BLOCK_SPLIT_RE.split(text):
+        lines = block.strip('\n').split('\n')
+        for i, line in enumerate(lines):
+            match = TIMING_RE.search(line)
+            if match:
+                g = match.groups()
+                start = _to_seconds(*g[:4])
+                end = _to_seconds(*g[4:])
+                cue_text = ' '.join(lines[i + 1:])
+                words = (cue_text if keep_markup else strip_markup(cue_text)).split()
+                cues.append((start, end, words))
+                break
+    cues.sort(key=lambda cue: (cue[0], cue[1]))
+    return cues
+
+
+class CueIndex:
+    """Sorted cue start/end times with the words of each cue and their dictionary keys."""
+
+    __slots__ = ('key', 'starts', 'ends', 'words', 'word_keys', 'max_span')
+
+    def __init__(self, key, starts, ends, words, word_keys=None):
+        self.key = key
+        self.starts = array('d', starts)
+        self.ends = array('d', ends)
+        self.words = words
+        if word_keys is None:
+            word_keys = [[word_key(w) for w in cue_words] for cue_words in words]
+        self.word_keys = word_keys
+        # Longest cue, so window lookups know how far back an overlapping cue can start
+        self.max_span = max((e - s for s, e in zip(self.starts, self.ends)), default=0.0)
+
+    def __len__(self):
+        return len(self.starts)
+
+    @classmethod
+    def from_cues(cls, key, cues):
+        return cls(key, [c[0] for c in cues], [c[1] for c in cues], [c[2] for c in cues])
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['key'], data['starts'], data['ends'], data['words'], data['word_keys'])
+
+    def to_dict(self):
+        return {
+            'version': INDEX_VERSION,
+            'key': self.key,
+            'starts': self.starts.tolist(),
+            'ends': self.ends.tolist(),
+            'words': self.words,
+            'word_keys': self.word_keys,
+        }
+
+    def window_indices(self, start, end):
+        """Positions of the cues overlapping [start, end], in start order."""
+        lo = bisect_left(self.starts, start - self.max_span)
+        hi = bisect_right(self.starts, end)
+        return [i for i in range(lo, hi) if self.ends[i] >= start]
+
+    def window(self, start, end):
+        """Cues overlapping [start, end] as compact [start, end, words, keys] lists."""
+        return [
+            [self.starts[i], self.ends[i], self.words[i], self.word_keys[i]]
+            for i in self.window_indices(start, end)
+        ]
+
+    def window_columns(self, start, end):
+        """
+        The cues of window() column by column, for the player: sorted 'starts'
+        and 'ends' it can binary-search, 'words', 'keys', and 'max_span' (the
+        longest of these cues, so it knows how far back an active cue can start).
+        """
+        indices = self.window_indices(start, end)
+        starts = [self.starts[i] for i in indices]
+        ends = [self.ends[i] for i in indices]
+        return {
+            'starts': starts,
+            'ends': ends,
+            'words': [self.words[i] for i in indices],
+            'keys': [self.word_keys[i] for i in indices],
+            'max_span': max((e - s for s, e in zip(starts, ends)), default=0.0),
+        }
+
+
+EMPTY_INDEX = CueIndex('', [], [], [])
+
+
+def index_key(path):
+    """Cache key for a subtitle file: changes whenever the file, or what its word keys depend on, does."""
+    st = os.stat(path)
+    raw = f"{INDEX_VERSION}:{os.path.abspath(path)}:{st.st_mtime_ns}:{st.st_size}:{normalizer_version()}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _disk_path(key):
+    return os.path.join(settings.CUE_INDEX_DIR, f"{key}.json")
+
+
+def _read_disk(key):
+    try:
+        with open(_disk_path(key), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get('version') != INDEX_VERSION or data.get('key') != key:
+        return None
+    return CueIndex.from_dict(data)
+
+
+def _write_disk(index):
+    os.makedirs(settings.CUE_INDEX_DIR, exist_ok=True)
+    path = _disk_path(index.key)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index.to_dict(), f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def _remember(index):
+    with _memory_lock:
+        _memory_cache[index.key] = index
+        _memory_cache.move_to_end(index.key)
+        while len(_memory_cache) > settings.CUE_INDEX_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+
+
+def build_cue_index(path, key=None):
+    """Parse `path` and persist the resulting index, bypassing every cache."""
+    key = key or index_key(path)
+    with open(path, 'rb') as f:
+        cues = parse_srt(decode(f.read()))
+    index = CueIndex.from_cues(key, cues)
+    _write_disk(index)
+    _remember(index)
+    return index
+
+
+def get_cue_index(path):
+    """Memory cache -> disk cache -> parse. Missing or unreadable files give an empty index."""
+    try:
+        key = index_key(path)
+    except OSError:
+        return EMPTY_INDEX
+
+    with _memory_lock:
+        index = _memory_cache.get(key)
+        if index is not None:
+            _memory_cache.move_to_end(key)
+            return index
+
+    index = _read_disk(key)
+    if index is not None:
+        _remember(index)
+        return index
+
+    try:
+        return build_cue_index(path, key=key)
+    except OSError:
+        return EMPTY_INDEX
+
+
+def cue_index_for_video(video):
+    if not video.subtitle_file:
+        return EMPTY_INDEX
+    try:
+        path = video.subtitle_file.path
+    except (ValueError, NotImplementedError):
+        return EMPTY_INDEX
+    return get_cue_index(path)
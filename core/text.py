@@ -0,0 +1,75 @@
+"""
+Word normalization shared by subtitle tokenization, the dictionary and saved words.
+
+Subtitle tokens reach the lookup tiers in many shapes ("<i>Running,", "RUNNING",
+"runs") that all mean the same dictionary entry. normalize() turns a raw token
+into a Token with:
+    surface  what the viewer sees: SRT/HTML markup and edge punctuation removed
+    key      the DictionaryEntry / definition cache key: markup and punctuation
+             removed, case folded, inflections mapped to their lemma, upper-cased
+
+Lemmas come from the prebuilt WordNet table (core/wordnet_table.py); words in
+common_words.json keep their own curated entry, and without a table the key is
+just the folded word. Lemmas are memoized per process, so workers need a
+restart after `manage.py build_wordnet_table`.
+"""
+import os
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from django.conf import settings
+
+from . import providers
+
+# <i>, </font>, <font color="..."> and ASS-style {\an8} overrides
+MARKUP_RE = re.compile(r'<[^>]*>|\{\\[^}]*\}')
+EDGE_PUNCTUATION_RE = re.compile(r'^[\W_]+|[\W_]+$')
+
+LEMMA_CACHE_SIZE = 50000
+
+Token = namedtuple('Token', ['surface', 'key'])
+
+
+def normalizer_version():
+    """Changes whenever a rebuilt WordNet table or edited common_words.json could change keys."""
+    parts = []
+    for path in (settings.WORDNET_TABLE_PATH, providers.common_words_path()):
+        try:
+            st = os.stat(path)
+            parts.append(f"{st.st_mtime_ns}:{st.st_size}")
+        except OSError:
+            parts.append('-')
+    return ':'.join(parts)
+
+
+def strip_markup(text):
+    return MARKUP_RE.sub('', text)
+
+
+def fold(word):
+    """Markup and punctuation removed, case folded: "<i>Don't," -> "dont"."""
+    return ''.join(c for c in strip_markup(word) if c.isalnum()).casefold()
+
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def lemma(folded):
+    """Dictionary form of an already folded word."""
+    if not folded.isalpha() or folded.upper() in providers.get('common_dict'):
+        return folded
+    try:
+        table = providers.get('wordnet')
+    except LookupError:
+        return folded
+    return table.lemmatize(folded)
+
+
+def normalize(word):
+    surface = EDGE_PUNCTUATION_RE.sub('', strip_markup(word))
+    folded = fold(word)
+    return Token(surface, lemma(folded).upper() if folded else '')
+
+
+def word_key(word):
+    """The DictionaryEntry key for a raw subtitle word ('' if it has no letters or digits)."""
+    return normalize(word).key
@@ -0,0 +1,87 @@
+"""
+Pre-sized WebP variants of Video.thumbnail.
+
+Uploaded thumbnails are often large JPEGs, but a grid card is 250px wide
+and the hero banner about 1280px. Each thumbnail is resized to the widths
+in settings.THUMBNAIL_WIDTHS and saved as WebP under THUMBNAIL_DERIVED_DIR:
+
+    thumbs/derived/<stem>-<width>w.<content hash>.webp
+
+The hash is of the encoded file, so a name never changes content and the
+files can be served with a year-long immutable Cache-Control (serve_media).
+Widths wider than the source are skipped; a source narrower than the largest
+width gets one variant at its own width instead.
+
+Video.thumbnail_variants records which source they were made from, so a
+Video save only renders them again when the thumbnail changed
+(core/signals.py). `manage.py build_thumbnails` backfills existing videos
+with a process pool.
+"""
+import hashlib
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .models import Video
+
+
+def target_widths(source_width, widths):
+    targets = sorted(w for w in widths if w < source_width)
+    widest = min(source_width, max(widths))
+    if widest not in targets:
+        targets.append(widest)
+    return targets
+
+
+def render_variants(source_name, widths=None, quality=None):
+    """
+    Write the WebP variants of the stored image `source_name`; returns
+    [[width, name], ...], narrowest first. Needs no database, so it can run
+    in a worker process.
+    """
+    widths = widths or settings.THUMBNAIL_WIDTHS
+    quality = quality or settings.THUMBNAIL_QUALITY
+    with default_storage.open(source_name, 'rb') as f:
+        image = ImageOps.exif_transpose(Image.open(f))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    stem = os.path.splitext(os.path.basename(source_name))[0]
+    variants = []
+    for width in target_widths(image.width, widths):
+        height = max(round(image.height * width / image.width), 1)
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        buffer = io.BytesIO()
+        resized.save(buffer, 'WEBP', quality=quality, method=6)
+        data = buffer.getvalue()
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        name = f"{settings.THUMBNAIL_DERIVED_DIR}/{stem}-{width}w.{digest}.webp"
+        if not default_storage.exists(name):
+            name = default_storage.save(name, ContentFile(data))
+        variants.append([width, name])
+    return variants
+
+
+def record_variants(video, source_name, variants):
+    """Store the variants made from `source_name` without going through Video.save()."""
+    video.thumbnail_variants = {'source': source_name, 'variants': variants} if variants else {}
+    Video.objects.filter(pk=video.pk).update(thumbnail_variants=video.thumbnail_variants)
+
+
+def update_video(video, force=False):
+    """Render the video's variants unless they are current; returns whether anything changed."""
+    source_name = video.thumbnail.name if video.thumbnail else ''
+    if not source_name:
+        if video.thumbnail_variants:
+            record_variants(video, '', [])
+            return True
+        return False
+    if not force and video.thumbnail_variants.get('source') == source_name:
+        return False
+    record_variants(video, source_name, render_variants(source_name))
+    return True
@@ -0,0 +1,183 @@
+"""
+Precomputed WordNet table for the dictionary's last-resort tier.
+
+Loading the NLTK WordNet corpus blocks the first lookup in every worker for
+seconds and adds a large chunk of RSS to each of them. `build_table` (run by
+`manage.py build_wordnet_table`) exports what the fallback needs into a
+small SQLite file instead:
+
+    lemmas(word, pos, definition, synonyms)   first definition + top synonyms per lemma,
+                                              and the parts of speech it is a lemma for
+    exceptions(form, pos, lemma)              irregular inflections ("ran" -> "run")
+
+At request time WordNetTable answers with one indexed query on a read-only
+connection; the corpus is never touched. The same table backs lemmatize(),
+a morphy-style lemmatizer used to normalize subtitle tokens (core/text.py).
+"""
+import os
+import sqlite3
+import threading
+
+# WordNet's regular inflection rules per part of speech (nltk's morphy)
+SUBSTITUTIONS_BY_POS = {
+    'n': [("s", ""), ("ses", "s"), ("ves", "f"), ("xes", "x"), ("zes", "z"),
+          ("ches", "ch"), ("shes", "sh"), ("men", "man"), ("ies", "y")],
+    'v': [("s", ""), ("ies", "y"), ("es", "e"), ("es", ""), ("ed", "e"), ("ed", ""), ("ing", "e"), ("ing", "")],
+    'a': [("er", ""), ("est", ""), ("er", "e"), ("est", "e")],
+    'r': [],
+}
+MORPHOLOGICAL_SUBSTITUTIONS = [rule for pos in 'nvar' for rule in SUBSTITUTIONS_BY_POS[pos]]
+
+DOUBLED_CONSONANT_SUFFIXES = {
+    None: ('ing', 'ed', 'er', 'est'), 'v': ('ing', 'ed'), 'a': ('er', 'est'), 'n': (), 'r': (),
+}
+
+# Order lemmatize() tries parts of speech in: verbs first so "running" -> "run"
+LEMMATIZE_POS_ORDER = 'vnar'
+
+# Bump when the table layout changes; WordNetTable refuses older files
+TABLE_VERSION = 2
+
+MAX_SYNONYMS = 5
+
+
+def candidate_forms(word, pos=None):
+    """`word` followed by every base form the regular rules (for `pos`, or all) could derive from it."""
+    forms = [word]
+    rules = SUBSTITUTIONS_BY_POS[pos] if pos else MORPHOLOGICAL_SUBSTITUTIONS
+    for suffix, replacement in rules:
+        if word.endswith(suffix) and len(word) > len(suffix):
+            forms.append(word[:-len(suffix)] + replacement)
+    # Doubled final consonant: "running" -> "runn" -> "run", "stopped" -> "stop"
+    for suffix in DOUBLED_CONSONANT_SUFFIXES[pos]:
+        stem = word[:-len(suffix)]
+        if word.endswith(suffix) and len(stem) > 2 and stem[-1] == stem[-2] and stem[-1] not in 'aeiouls':
+            forms.append(stem[:-1])
+    return list(dict.fromkeys(forms))
+
+
+def synonyms_for(word, synsets):
+    """Same selection as the old request-time fallback, in a stable order."""
+    names = []
+    for syn in synsets[:3]:
+        for lemma in syn.lemmas():
+            name = lemma.name().replace('_', ' ')
+            if name.lower() != word.lower():
+                names.append(name)
+    return list(dict.fromkeys(names))[:MAX_SYNONYMS]
+
+
+def build_table(path, wordnet, progress=None):
+    """Export `wordnet` (an NLTK WordNet corpus reader) to a SQLite file at `path`."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(f"""
+            CREATE TABLE lemmas (word TEXT PRIMARY KEY, pos TEXT NOT NULL, definition TEXT NOT NULL, synonyms TEXT NOT NULL) WITHOUT ROWID;
+            CREATE TABLE exceptions (form TEXT NOT NULL, pos TEXT NOT NULL, lemma TEXT NOT NULL, PRIMARY KEY (form, pos, lemma)) WITHOUT ROWID;
+            PRAGMA user_version = {TABLE_VERSION};
+        """)
+        rows = []
+        # Hover lookups are single alphanumeric words, so multi-word lemmas are skipped
+        for i, word in enumerate(sorted({w.lower() for w in wordnet.all_lemma_names() if w.isalnum()})):
+            synsets = wordnet.synsets(word)
+            if synsets:
+                # Satellite adjectives ('s') count as adjectives, as in morphy
+                pos = "".join(sorted({'a' if p == 's' else p for p in wordnet._lemma_pos_offset_map.get(word, {})}))
+                rows.append((word, pos, synsets[0].definition(), ",".join(synonyms_for(word, synsets))))
+            if progress and i % 10000 == 0:
+                progress(i)
+        conn.executemany("INSERT INTO lemmas VALUES (?, ?, ?, ?)", rows)
+
+        exceptions = set()
+        for pos, pos_map in wordnet._exception_map.items():
+            pos = 'a' if pos == 's' else pos
+            for form, lemmas in pos_map.items():
+                for lemma in lemmas:
+                    if form.isalnum() and lemma.isalnum():
+                        exceptions.add((form.lower(), pos, lemma.lower()))
+        conn.executemany("INSERT OR IGNORE INTO exceptions VALUES (?, ?, ?)", sorted(exceptions))
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    return len(rows), len(exceptions)
+
+
+class WordNetTable:
+    """Read-only lookups against a table written by build_table, one connection per thread."""
+
+    def __init__(self, path):
+        if not os.path.exists(path):
+            raise LookupError(f"WordNet table {path} not found; run `manage.py build_wordnet_table`.")
+        self.path = path
+        self._local = threading.local()
+        version = self._conn().execute("PRAGMA user_version").fetchone()[0]
+        if version != TABLE_VERSION:
+            raise LookupError(f"WordNet table {path} is outdated; re-run `manage.py build_wordnet_table`.")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def lemmatize(self, word):
+        """
+        Base form of `word` the way nltk's morphy finds it, trying verbs, nouns,
+        adjectives then adverbs: per part of speech its irregular forms ("bigger"
+        -> "big"), else the word itself if it is a lemma ("us" stays "us"), else
+        the regular-rule forms. One query; unknown words come back unchanged.
+        """
+        word = word.lower()
+        forms = list(dict.fromkeys(f for pos in LEMMATIZE_POS_ORDER for f in candidate_forms(word, pos)))
+        placeholders = ",".join("?" * len(forms))
+        rows = self._conn().execute(
+            f"SELECT word, pos, 0 FROM lemmas WHERE word IN ({placeholders}) "
+            f"OR word IN (SELECT lemma FROM exceptions WHERE form = ?) "
+            f"UNION ALL SELECT lemma, pos, 1 FROM exceptions WHERE form = ?",
+            [*forms, word, word],
+        ).fetchall()
+        lemma_pos = {}
+        irregular = {}
+        for form, pos, is_exception in rows:
+            if is_exception:
+                irregular.setdefault(pos, []).append(form)
+            else:
+                lemma_pos[form] = pos
+        if not lemma_pos:
+            return word
+
+        for pos in LEMMATIZE_POS_ORDER:
+            if pos in irregular:
+                candidates = irregular[pos] + [word]
+            else:
+                candidates = candidate_forms(word, pos)
+            for form in candidates:
+                if pos in lemma_pos.get(form, ''):
+                    return form
+        return word
+
+    def lookup(self, word):
+        """(definition, synonyms) for the first known base form of `word`, or None. One query."""
+        word = word.lower()
+        forms = candidate_forms(word)
+        placeholders = ",".join("?" * len(forms))
+        rows = self._conn().execute(
+            f"SELECT word, definition, synonyms, word IN (SELECT lemma FROM exceptions WHERE form = ?) "
+            f"FROM lemmas WHERE word IN ({placeholders}) "
+            f"OR word IN (SELECT lemma FROM exceptions WHERE form = ?)",
+            [word, *forms, word],
+        ).fetchall()
+        if not rows:
+            return None
+        # Prefer the word itself, then irregular forms, then rule-derived forms
+        rank = {form: i for i, form in enumerate(forms)}
+        best = min(rows, key=lambda r: (r[0] != word, not r[3], rank.get(r[0], len(rank))))
+        return best[1], [s for s in best[2].split(',') if s]
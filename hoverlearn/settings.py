@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so the time and queries of every other middleware are counted too
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -74,12 +77,38 @@ WSGI_APPLICATION = 'hoverlearn.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# The dictionary (DictionaryEntry, UndefinedWord, EnrichmentJob) lives in its own
+# SQLite file, away from the user write path (see core/routers.py). One writer
+# connection with IMMEDIATE transactions; readers are query_only. WAL lets them
+# read while it writes, and the file is memory-mapped up to DICTIONARY_MMAP_SIZE.
+# Ship or load a prebuilt file with `manage.py dictionary_db export/import`.
+DICTIONARY_DB_PATH = BASE_DIR / 'dictionary.sqlite3'
+DICTIONARY_MMAP_SIZE = 256 * 1024 * 1024
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    'dictionary': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': DICTIONARY_DB_PATH,
+        'OPTIONS': {
+            'init_command': f'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; PRAGMA mmap_size={DICTIONARY_MMAP_SIZE}',
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+    },
+    'dictionary_read': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': DICTIONARY_DB_PATH,
+        'OPTIONS': {
+            'init_command': f'PRAGMA query_only=1; PRAGMA mmap_size={DICTIONARY_MMAP_SIZE}',
+        },
+        'TEST': {'MIRROR': 'dictionary'},
+    },
 }
+DATABASE_ROUTERS = ['core.routers.DictionaryRouter']
 
 
 # Password validation
@@ -128,4 +157,101 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 
 # Uploaded Video Files
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / 'media'
\ No newline at end of file
+MEDIA_ROOT = BASE_DIR / 'media'
+# Parsed subtitle cue indexes (see core/subtitles.py)
+CUE_INDEX_DIR = BASE_DIR / 'cache' / 'cues'
+CUE_INDEX_CACHE_SIZE = 32
+
+# Gemini API; the key only comes from the environment. Without one, the first Gemini
+# lookup raises ImproperlyConfigured (see core/providers.py), everything else still works
+GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')
+GEMINI_MODEL = "gemini-2.5-flash"
+
+# WordNet fallback table written by `manage.py build_wordnet_table` (see core/wordnet_table.py)
+WORDNET_TABLE_PATH = BASE_DIR / 'cache' / 'wordnet.sqlite3'
+
+# Lookup backends to build when the app loads instead of on first use
+# (see core/providers.py), e.g. ['gemini', 'common_dict', 'wordnet']
+HOVERLEARN_PRELOAD = []
+
+# Gemini lookups (see core/gemini.py): words per prompt, how long (seconds) a
+# word may wait for its batch to fill, and how long callers wait for an answer
+GEMINI_BATCH_SIZE = 20
+GEMINI_BATCH_MAX_WAIT = 0.05
+GEMINI_TIMEOUT = 30.0
+
+# Async get_definition: the most hover lookups one process lets wait on Gemini at
+# once (across all its event loops, so under WSGI too), and how long (seconds)
+# each may wait before the card answers without it. Slow words are not
+# negative-cached for timing out
+GEMINI_ASYNC_MAX_CONCURRENT = 64
+GEMINI_ASYNC_TIMEOUT = 5.0
+
+# Background enrichment (see core/jobs.py): on a miss the hover card answers from
+# WordNet at once and an EnrichmentJob fetches the Gemini definition afterwards,
+# in a thread of the web process (ENRICHMENT_IN_PROCESS) or in
+# `manage.py run_enrichment_jobs`. False waits for Gemini as before
+DEFINITION_ENRICH_IN_BACKGROUND = True
+ENRICHMENT_IN_PROCESS = True
+ENRICHMENT_BATCH_SIZE = 20
+ENRICHMENT_MAX_ATTEMPTS = 5
+ENRICHMENT_RETRY_DELAY = 30
+# The card re-asks every WORD_CARD_POLL_SECONDS while enriching, at most WORD_CARD_MAX_POLLS times
+WORD_CARD_POLL_SECONDS = 1.5
+WORD_CARD_MAX_POLLS = 20
+
+# Negative cache for words no tier can define: seconds before the first retry,
+# doubling after every further failure up to the maximum
+NEGATIVE_CACHE_TTL = 60 * 60
+NEGATIVE_CACHE_MAX_TTL = 30 * 24 * 60 * 60
+
+# Shared cache used across worker processes (definitions, see core/cache.py).
+# File-based so it works out of the box; point it at Redis/Memcached in production.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'django',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+
+# Word definition cache: shared level (alias, key version, timeout in seconds)
+# and the small per-process LRU in front of it
+DEFINITION_CACHE_ALIAS = 'default'
+DEFINITION_CACHE_VERSION = 2
+DEFINITION_CACHE_TIMEOUT = 24 * 60 * 60
+DEFINITION_LOCAL_CACHE_SIZE = 1000
+DEFINITION_LOCAL_CACHE_TTL = 60
+
+# Video search backend (see core/search.py): FTS5 over titles, descriptions and
+# subtitle transcripts, or 'core.search.SimpleBackend' for plain icontains
+SEARCH_BACKEND = 'core.search.FTS5Backend'
+
+# Watch-progress buffer (see core/progress.py): each worker keeps the latest
+# positions it was sent and flushes them to WatchHistory every
+# PROGRESS_FLUSH_INTERVAL seconds; the shared cache lets other workers read them
+PROGRESS_CACHE_ALIAS = 'default'
+PROGRESS_FLUSH_INTERVAL = 30
+PROGRESS_BUFFER_TIMEOUT = 24 * 60 * 60
+
+# Thumbnail variants (see core/thumbnails.py): WebP copies of Video.thumbnail at
+# these widths, under MEDIA_ROOT/THUMBNAIL_DERIVED_DIR with content-hashed names.
+# Grid cards are THUMBNAIL_CARD_WIDTH css pixels wide
+THUMBNAIL_WIDTHS = (320, 640, 1280)
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_DERIVED_DIR = 'thumbs/derived'
+THUMBNAIL_CARD_WIDTH = 250
+
+# Metrics (see core/metrics.py), served in the Prometheus text format at /metrics/
+# to staff users or to a scraper sending "Authorization: Bearer <METRICS_TOKEN>".
+# Each worker publishes its totals to the shared cache every METRICS_PUBLISH_INTERVAL
+# seconds; a worker silent for METRICS_STALE_AFTER seconds is taken to be gone
+METRICS_CACHE_ALIAS = 'default'
+METRICS_PUBLISH_INTERVAL = 15
+METRICS_STALE_AFTER = 10 * 60
+METRICS_MAX_PROCESSES = 64
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Username that migration 0012 gives the saved words from before "My List" was per user;
+# empty gives them to the first superuser
+SAVED_WORDS_LEGACY_OWNER = os.environ.get('SAVED_WORDS_LEGACY_OWNER', '')
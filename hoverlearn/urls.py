@@ -1,7 +1,6 @@
 from django.contrib import admin
 from django.urls import path
 from django.conf import settings
-from django.conf.urls.static import static
 from core import views
 
 urlpatterns = [
@@ -14,15 +13,23 @@ urlpatterns = [
 
     # Main URLs (Protected)
     path('', views.home, name='home'),
+    path('videos/page/', views.video_grid_page, name='video_grid_page'),
     path('watch/<int:video_id>/', views.watch_video, name='watch'),
     path('my-list/', views.saved_list, name='saved_list'),
+    path('my-list/page/', views.saved_words_page, name='saved_words_page'),
+    path('my-list/export/<str:kind>/', views.export_list, name='export_list'),
     
     # API
     path('get-def/<str:word>/', views.get_definition, name='get_def'),
+    path('get-defs/', views.get_definitions, name='get_defs'),
     path('save-word/<str:word>/', views.save_word, name='save_word'),
+    path('save-words/', views.save_words, name='save_words'),
     path('delete-word/<int:word_id>/', views.delete_word, name='delete_word'),
 
     # Video-related endpoints
+    path('video/<int:video_id>/cues/', views.video_cues, name='video_cues'),
+    path('video/<int:video_id>/notes/', views.video_notes, name='video_notes'),
+    path('video/<int:video_id>/notes/page/', views.video_notes_page, name='video_notes_page'),
     path('video/<int:video_id>/save-note/', views.save_note, name='save_note'),
     path('note/<int:note_id>/delete/', views.delete_note, name='delete_note'),
     path('update-history/', views.update_history, name='update_history'),
@@ -30,4 +37,9 @@ urlpatterns = [
     # Voting URL
     path('vote/<int:video_id>/<str:vote_type>/', views.handle_vote, name='handle_vote'),
 
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    # Prometheus metrics (staff, or a scraper with METRICS_TOKEN)
+    path('metrics/', views.export_metrics, name='metrics'),
+
+    # Uploaded media, with Range support for seeking (served in production too)
+    path(settings.MEDIA_URL.lstrip('/') + '<path:path>', views.stream_media, name='media'),
+]
\ No newline at end of file